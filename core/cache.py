@@ -0,0 +1,42 @@
+"""CACHES entries built from a CACHE_URL (used by core/settings.py)"""
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+REDIS_SCHEMES = ('redis', 'rediss')
+
+# The cache table used when no CACHE_URL is set; `migrate` creates it (membership migration 0019)
+DEFAULT_TABLE = 'membership_cache'
+
+
+def cache_config(url=None, timeout=300):
+    """One CACHES entry, with hits and misses reported per request (see membership/metrics.py).
+
+    `url` is redis://host:6379/0 (or rediss://), db://table_name for
+    Django's database cache, or locmem:// for a cache private to the
+    process. Production should use Redis: reads cost no query and incr() is
+    atomic. With no url the database cache in DEFAULT_TABLE is used as a
+    development fallback; it is still shared by every web worker, job
+    worker and management command, but each read is a query. A
+    process-local cache is only correct when a single process does all the
+    work, as in the test suite.
+    """
+    if not url:
+        return _entry('MetricsDatabaseCache', DEFAULT_TABLE, timeout)
+
+    parts = urlsplit(url)
+    if parts.scheme in REDIS_SCHEMES:
+        return _entry('MetricsRedisCache', url, timeout)
+    if parts.scheme == 'db':
+        return _entry('MetricsDatabaseCache', parts.netloc or DEFAULT_TABLE, timeout)
+    if parts.scheme == 'locmem':
+        return _entry('MetricsLocMemCache', parts.netloc or 'membership', timeout)
+    raise ImproperlyConfigured(f'Unsupported CACHE_URL scheme: {parts.scheme!r}')
+
+
+def _entry(backend, location, timeout):
+    return {
+        'BACKEND': f'membership.metrics.{backend}',
+        'LOCATION': location,
+        'TIMEOUT': timeout,
+    }
@@ -1,11 +1,14 @@
 # core/urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from membership.media import serve_media
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # Streams with Range/ETag support, or hands off to the proxy (see membership/media.py)
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
     path('', include('membership.urls')),
+    # After the app so its admin/dashboard/ is not swallowed by the admin site's catch-all
+    path('admin/', admin.site.urls),
 ]
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
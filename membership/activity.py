@@ -0,0 +1,223 @@
+import atexit
+import collections
+import functools
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+
+from .models import ActivityLog, UserAgent
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityLogBuffer:
+    """Buffers ActivityLog rows and writes them with bulk_create off the request path"""
+
+    def __init__(self, batch_size=100, flush_interval=2.0, max_queue=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+
+        # Stats, updated by request threads and the writer thread under self._lock
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.overflow_writes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    @property
+    def sync(self):
+        return getattr(settings, 'ACTIVITY_LOG_SYNC', False)
+
+    def push(self, entry):
+        """Queue an unsaved ActivityLog instance for writing"""
+        if self.sync:
+            self._write([entry])
+            return
+        # The writer thread has its own connection: hand it the row only once the user (and user
+        # agent) it points at are committed, and never if the surrounding transaction rolls back
+        transaction.on_commit(functools.partial(self._enqueue, entry))
+
+    def _enqueue(self, entry):
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            # Apply back-pressure rather than dropping audit rows
+            with self._lock:
+                self.overflow_writes += 1
+            logger.warning('Activity log queue full (%s rows), writing synchronously', self.queue.qsize())
+            self._write([entry])
+
+    def flush(self):
+        """Drain everything currently queued and write it"""
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    break
+                self._write(batch)
+
+    def shutdown(self):
+        """Stop the worker and write whatever is still queued"""
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'flushes': self.flushes,
+                'flushed_rows': self.flushed_rows,
+                'failed_rows': self.failed_rows,
+                'overflow_writes': self.overflow_writes,
+                'last_flush_seconds': self.last_flush_seconds,
+                'max_flush_seconds': self.max_flush_seconds,
+            }
+
+    def _ensure_worker(self):
+        # Forked workers (gunicorn) inherit the object but not the thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch:
+                with self._flush_lock:
+                    self._write(batch)
+                close_old_connections()
+
+    def _write_one(self, entry):
+        entry.pk = None  # may have been assigned by the rolled-back batch
+        try:
+            ActivityLog.objects.bulk_create([entry])
+        except IntegrityError:
+            logger.exception('Dropped activity log row for user %s', entry.user_id)
+            return False
+        return True
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        try:
+            # Its own transaction on the writer thread, so a bad foreign key surfaces here
+            ActivityLog.objects.bulk_create(batch, batch_size=self.batch_size)
+            written = batch
+        except IntegrityError:
+            # One row whose user has since been deleted fails the whole INSERT; keep the rest
+            written = [entry for entry in batch if self._write_one(entry)]
+        except Exception:
+            with self._lock:
+                self.failed_rows += len(batch)
+            logger.exception('Failed to write %s activity log rows', len(batch))
+            return
+        # bulk_create sends no signals, so refresh the affected dashboards here
+        from . import dashboard  # imported late: dashboard -> catalog -> billing -> activity
+        for user_id in {entry.user_id for entry in written}:
+            dashboard.invalidate(user_id)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.flushes += 1
+            self.flushed_rows += len(written)
+            self.failed_rows += len(batch) - len(written)
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+        depth = self.queue.qsize()
+        if depth >= self.batch_size * 10:
+            logger.warning('Activity log writer is falling behind: %s rows queued', depth)
+
+
+activity_buffer = ActivityLogBuffer(
+    batch_size=getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 2.0),
+    max_queue=getattr(settings, 'ACTIVITY_LOG_MAX_QUEUE', 10000),
+)
+
+atexit.register(activity_buffer.shutdown)
+
+
+def log_activity(user, action, description, ip_address=None, user_agent=None):
+    """Helper function to log user activities (written in batches by the activity buffer)"""
+    activity_buffer.push(ActivityLog(
+        user=user,
+        action=action,
+        description=description,
+        ip_address=ip_address,
+        user_agent_id=user_agent_id(user_agent)
+    ))
+
+
+# User-Agent header -> UserAgent id, least recently used first. A site sees a few hundred distinct
+# headers at most, so after warm-up logging costs no lookup.
+_user_agent_ids = collections.OrderedDict()
+_user_agent_lock = threading.Lock()
+
+
+def user_agent_id(value):
+    """The UserAgent row for a User-Agent header, created on first sight. None for a missing header."""
+    if not value:
+        return None
+    with _user_agent_lock:
+        pk = _user_agent_ids.get(value)
+        if pk is not None:
+            _user_agent_ids.move_to_end(value)
+            return pk
+
+    digest = hashlib.sha256(value.encode('utf-8')).hexdigest()
+    agent, _ = UserAgent.objects.get_or_create(digest=digest, defaults={'value': value})
+    # Remembered only once committed: an id from a transaction that rolls back names no row
+    transaction.on_commit(functools.partial(_remember_user_agent, value, agent.pk))
+    return agent.pk
+
+
+def reset_user_agent_cache():
+    with _user_agent_lock:
+        _user_agent_ids.clear()
+
+
+def _remember_user_agent(value, pk):
+    with _user_agent_lock:
+        _user_agent_ids[value] = pk
+        _user_agent_ids.move_to_end(value)
+        while len(_user_agent_ids) > getattr(settings, 'ACTIVITY_USER_AGENT_CACHE_SIZE', 1024):
+            _user_agent_ids.popitem(last=False)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import  MembershipPlan,SystemSetting,Notification,ActivityLog,Member,UserProfile,Payment,UserMembership
+from .models import  MembershipPlan,SystemSetting,Notification,ActivityLog,Member,UserProfile,Payment,UserMembership,Job,Counter,RevenueRollup,RevenueTotal,Skill,WebhookEvent
 
 admin.site.register(MembershipPlan)
 admin.site.register(Payment)
@@ -9,4 +9,10 @@ admin.site.register(ActivityLog)
 admin.site.register(Member)
 admin.site.register(SystemSetting)
 admin.site.register(UserMembership)
+admin.site.register(Job)
+admin.site.register(Counter)
+admin.site.register(RevenueRollup)
+admin.site.register(RevenueTotal)
+admin.site.register(Skill)
 
+admin.site.register(WebhookEvent)
@@ -0,0 +1,178 @@
+"""
+ActivityLog retention: old rows move to gzipped JSON Lines files, one directory per day.
+
+`archive_activity()` (run by `manage.py archive_activity`) takes rows older
+than ACTIVITY_LOG_RETENTION_DAYS oldest first, a chunk at a time: each
+chunk is written to ACTIVITY_ARCHIVE_DIR/YYYY/MM/DD/<first id>-<last id>.jsonl.gz
+and then deleted from the table, so the hot table (and the dashboard's
+recent-activity query) stays the same size however long the site runs.
+`history()` reads the table and the archive together for audits. Each
+archive file has a small <name>.users.json index of the user ids in it,
+so an audit lists every day directory in its range but only decompresses
+the files that hold that user's rows.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import dashboard
+from .models import ActivityLog, UserAgent
+
+FIELDS = ('id', 'user_id', 'action', 'description', 'ip_address', 'timestamp')
+# Archived rows carry the header itself, so files stay readable without the UserAgent table
+EXPRESSIONS = {'agent': F('user_agent__value')}
+
+# Sidecar of each archive file listing the user ids it holds
+INDEX_SUFFIX = '.users.json'
+
+
+def archive_dir():
+    return str(getattr(settings, 'ACTIVITY_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive', 'activity')))
+
+
+def cutoff(now=None):
+    """Rows older than this belong in the archive"""
+    days = getattr(settings, 'ACTIVITY_LOG_RETENTION_DAYS', 90)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archive_activity(before=None, chunk_size=None):
+    """Move every row older than `before` (default: the retention cutoff) to the archive.
+
+    A chunk's file is complete on disk before its rows are deleted. If a
+    run dies in between, the next run rewrites the same chunk under the
+    same name, and history() drops any row it sees twice. Returns the
+    number of rows moved.
+    """
+    before = before or cutoff()
+    chunk_size = chunk_size or getattr(settings, 'ACTIVITY_ARCHIVE_CHUNK_SIZE', 5000)
+    moved = 0
+    while True:
+        # Oldest first through activitylog_time_idx, so files fill one day at a time
+        rows = list(
+            ActivityLog.objects.filter(timestamp__lt=before).order_by('timestamp', 'id')
+            .values(*FIELDS, **EXPRESSIONS)[:chunk_size]
+        )
+        if not rows:
+            break
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row['timestamp'].astimezone(dt_timezone.utc).date(), []).append(row)
+        for day, day_rows in by_day.items():
+            _write(day, day_rows)
+        with transaction.atomic():
+            # A plain DELETE: .delete() would load every row to send post_delete, whose receiver
+            # invalidates the owner's dashboard once per row
+            chunk = ActivityLog.objects.filter(pk__in=[row['id'] for row in rows])
+            chunk._raw_delete(chunk.db)
+            dashboard.invalidate_many({row['user_id'] for row in rows})
+        moved += len(rows)
+    return moved
+
+
+def history(user, start=None, end=None, action=None):
+    """A user's activity newest first, from the table and the archive, as unsaved ActivityLog instances.
+
+    Archive days outside [start, end) are not opened; with a `start`
+    newer than the retention cutoff the archive is skipped entirely.
+    """
+    user_id = getattr(user, 'pk', user)
+    hot = ActivityLog.objects.filter(user_id=user_id)
+    if start:
+        hot = hot.filter(timestamp__gte=start)
+    if end:
+        hot = hot.filter(timestamp__lt=end)
+    if action:
+        hot = hot.filter(action=action)
+    entries = list(hot.select_related('user_agent').order_by('-timestamp', '-id'))
+
+    seen = {entry.pk for entry in entries}
+    if start is None or start < cutoff():
+        for row in _archived(start, end, user_id):
+            if row['user_id'] != user_id or row['id'] in seen:
+                continue
+            timestamp = parse_datetime(row.pop('timestamp'))
+            if (start and timestamp < start) or (end and timestamp >= end) or (action and row['action'] != action):
+                continue
+            seen.add(row['id'])
+            agent = row.pop('user_agent')
+            entries.append(ActivityLog(
+                **row, timestamp=timestamp, user_agent=UserAgent(value=agent) if agent else None,
+            ))
+    entries.sort(key=lambda entry: (entry.timestamp, entry.pk), reverse=True)
+    return entries
+
+
+def archived_days():
+    """Dates that have archive files, oldest first"""
+    days = []
+    root = archive_dir()
+    for dirpath, _, filenames in os.walk(root):
+        if any(name.endswith('.jsonl.gz') for name in filenames):
+            parts = os.path.relpath(dirpath, root).split(os.sep)
+            if len(parts) == 3 and all(part.isdigit() for part in parts):
+                days.append(datetime(*map(int, parts)).date())
+    return sorted(days)
+
+
+def _archived(start, end, user_id=None):
+    for day in archived_days():
+        # A day's partition holds timestamps in [day 00:00, next day 00:00) UTC
+        day_start = datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+        if (end and day_start >= end) or (start and day_start + timedelta(days=1) <= start):
+            continue
+        directory = _day_dir(day)
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.jsonl.gz'):
+                continue
+            if user_id is not None:
+                users = _users(os.path.join(directory, name))
+                if users is not None and user_id not in users:
+                    continue
+            with gzip.open(os.path.join(directory, name), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+
+
+def _users(path):
+    """User ids in an archive file, or None when its index is missing (the file is then read)"""
+    try:
+        with open(path + INDEX_SUFFIX) as f:
+            return set(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def _write(day, rows):
+    directory = _day_dir(day)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{rows[0]["id"]}-{rows[-1]["id"]}.jsonl.gz')
+    # Written first: a file without its index is read in full, never skipped
+    index = path + INDEX_SUFFIX
+    with open(index + '.tmp', 'w') as f:
+        json.dump(sorted({row['user_id'] for row in rows}), f)
+    os.replace(index + '.tmp', index)
+
+    partial = path + '.tmp'
+    with open(partial, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            for row in rows:
+                line = {**row, 'timestamp': row['timestamp'].isoformat()}
+                line['user_agent'] = line.pop('agent')
+                f.write(json.dumps(line, separators=(',', ':')).encode('utf-8') + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    # Readers only ever see whole files
+    os.replace(partial, path)
+    return path
+
+
+def _day_dir(day):
+    return os.path.join(archive_dir(), f'{day:%Y}', f'{day:%m}', f'{day:%d}')
@@ -0,0 +1,124 @@
+import logging
+
+import stripe
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import fake_stripe
+from .activity import log_activity
+from .jobs import enqueue
+from .models import Payment, UserMembership
+
+logger = logging.getLogger(__name__)
+
+# Prices are stored in USD and converted at checkout
+CONVERSION_RATES = {'USD': 1.0, 'EUR': 0.85, 'GBP': 0.75}
+
+
+def get_stripe():
+    """Return the Stripe client module, or the offline stand-in when STRIPE_FAKE is set"""
+    if getattr(settings, 'STRIPE_FAKE', False):
+        return fake_stripe
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
+
+
+def start_charge(user, plan, amount, currency, token):
+    """Create a pending Payment and queue the Stripe charge for it.
+
+    The idempotency key is derived from user + plan + attempt number, so a
+    double-submitted form or a retried job never charges the card twice.
+    """
+    pending = Payment.objects.filter(user=user, plan=plan, status='pending').first()
+    if pending:
+        return pending
+
+    attempt = Payment.objects.filter(user=user, plan=plan).count() + 1
+    key = f'charge-{user.pk}-{plan.pk}-{attempt}'
+    try:
+        with transaction.atomic():
+            payment = Payment.objects.create(
+                user=user,
+                plan=plan,
+                amount=amount,
+                currency=currency,
+                stripe_payment_intent_id=key,
+                idempotency_key=key,
+                status='pending',
+                description=f'{plan.tier.title()} Membership Payment'
+            )
+            enqueue(
+                'membership.billing.charge_payment',
+                {'payment_id': str(payment.pk), 'token': token},
+                dedupe_key=key,
+            )
+    except IntegrityError:
+        # A concurrent request for the same attempt won the race
+        return Payment.objects.get(idempotency_key=key)
+    return payment
+
+
+def charge_payment(payload, job=None):
+    """Job handler: run the Stripe charge for a pending Payment"""
+    payment = Payment.objects.select_related('plan', 'user').get(pk=payload['payment_id'])
+    if payment.status != 'pending':
+        payload.pop('token', None)
+        return
+
+    plan = payment.plan
+    try:
+        charge = get_stripe().Charge.create(
+            amount=int(payment.amount * 100),
+            currency=payment.currency.lower(),
+            description=f'{plan.tier.title()} Membership - {plan.name}',
+            source=payload['token'],
+            idempotency_key=payment.idempotency_key,
+        )
+    except stripe.error.CardError as e:
+        # Declines will not succeed on retry
+        payload.pop('token', None)
+        _mark_failed(payment, e.user_message or str(e))
+        return
+
+    payload.pop('token', None)
+    if charge.status != 'succeeded':
+        _mark_failed(payment, f'Charge {charge.id} returned status {charge.status}')
+        return
+
+    with transaction.atomic():
+        user_membership, created = UserMembership.objects.get_or_create(
+            user=payment.user,
+            defaults={'plan': plan, 'status': 'active'}
+        )
+        if not created:
+            user_membership.plan = plan
+            user_membership.status = 'active'
+            user_membership.save()
+
+        payment.user_membership = user_membership
+        payment.stripe_payment_intent_id = charge.id
+        payment.status = 'succeeded'
+        payment.save()
+
+    log_activity(
+        payment.user,
+        'payment',
+        f'Successfully upgraded to {plan.tier} membership'
+    )
+
+
+def _charge_payment_failed(payload, job=None):
+    payload.pop('token', None)
+    payment = Payment.objects.filter(pk=payload['payment_id'], status='pending').first()
+    if payment:
+        _mark_failed(payment, 'Payment could not be processed')
+
+
+charge_payment.on_failure = _charge_payment_failed
+
+
+def _mark_failed(payment, reason):
+    logger.info('Payment %s failed: %s', payment.pk, reason)
+    payment.status = 'failed'
+    payment.description = f'{payment.description} ({reason})'[:200]
+    payment.save()
@@ -0,0 +1,306 @@
+import json
+import logging
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import catalog, search, skills
+from .counters import recount
+from .metrics import QueryTimer
+from .models import (
+    ActivityLog, CertificationProgram, IndustryEvent, MemberDirectory, MemberSkill, MembershipPlan, Payment,
+    ProfessionalAssociation, Skill, UserMembership, UserProfile,
+)
+
+BUDGET_FILE = Path(__file__).with_name('budgets.json')
+
+HISTORY_FILE = Path(settings.BASE_DIR) / '.benchmarks' / 'route_budgets.json'
+
+# Runs kept in the history file for the comparison table
+HISTORY_RUNS = 10
+
+PLANS = [('bronze', Decimal('10.00')), ('silver', Decimal('20.00')), ('gold', Decimal('30.00'))]
+TITLES = ['Software Engineer', 'Data Scientist', 'Product Manager', 'Accountant', 'Nurse', 'Architect']
+SKILLS = ['python', 'django', 'sql', 'leadership', 'finance', 'design', 'cloud', 'statistics']
+INDUSTRIES = ['Technology', 'Healthcare', 'Finance']
+
+# (label, url name, url kwargs from the seeded data, query string, who is logged in)
+# Every named route in membership/urls.py needs at least one entry; the label is the budget key.
+ROUTES = [
+    ('homepage', 'homepage', None, '', None),
+    ('pricing', 'pricing', None, '', None),
+    ('aboutus', 'aboutus', None, '', None),
+    ('contact', 'contact', None, '', None),
+    ('login', 'login', None, '', None),
+    ('register', 'register', None, '', None),
+    ('forgot_password', 'forgot_password', None, '', None),
+    ('confirm_code', 'confirm_code', None, '', 'reset'),
+    ('reset_password', 'reset_password', None, '', 'reset'),
+    ('dashboard', 'dashboard', None, '', 'member'),
+    ('profile', 'profile', None, '', 'member'),
+    ('membership_plans', 'membership_plans', None, '', 'member'),
+    ('upgrade_membership', 'upgrade_membership', lambda data: {'tier': 'gold'}, '', 'member'),
+    ('currency_selection', 'currency_selection', lambda data: {'plan_id': data['plan'].pk}, '', 'member'),
+    ('payment', 'payment', lambda data: {'plan_id': data['plan'].pk, 'currency': 'EUR'}, '', 'member'),
+    ('payment_success', 'payment_success', None, lambda data: f'payment={data["payment"].pk}', 'member'),
+    ('payment_history', 'payment_history', None, '', 'member'),
+    ('cancel_membership', 'cancel_membership', None, '', 'member'),
+    ('notifications', 'notifications', None, '', 'member'),
+    ('stripe_webhook', 'stripe_webhook', None, '', None),
+    ('admin_dashboard', 'admin_dashboard', None, '', 'admin'),
+    ('member_directory', 'member_directory', None, '', 'member'),
+    ('member_directory[search]', 'member_directory', None, 'q=engineer&industry=Technology', 'member'),
+    ('member_directory[skill]', 'member_directory', None, 'skill=python', 'member'),
+    ('skill_facets', 'skill_facets', None, '', 'member'),
+    ('industry_events', 'industry_events', None, '', 'member'),
+    ('event_registration', 'event_registration', lambda data: {'event_id': data['event'].pk}, '', 'member'),
+    ('certification_programs', 'certification_programs', None, '', 'member'),
+    ('metrics', 'metrics', None, '', 'admin'),
+    ('request_profiles', 'request_profiles', None, '', 'admin'),
+    ('request_profile_download', 'request_profile_download', lambda data: {'name': 'missing.prof'}, '', 'admin'),
+    # Last, since it ends the session
+    ('logout', 'logout', None, '', 'member'),
+]
+
+
+def seed(users=200, payments=5, activity=10, events=20):
+    """Synthetic members with payments, activity and directory entries. Returns the objects the routes need."""
+    plans = []
+    for tier, price in PLANS:
+        plan, _ = MembershipPlan.objects.get_or_create(
+            tier=tier, defaults={'name': tier.title(), 'price': price, 'description': '', 'features': 'Feature'},
+        )
+        plans.append(plan)
+    associations = [
+        ProfessionalAssociation.objects.create(name=f'Perf {industry}', description='', industry=industry)
+        for industry in INDUSTRIES
+    ]
+
+    User.objects.bulk_create(
+        [
+            User(username=f'perf_{i}', email=f'perf_{i}@example.com', first_name=f'First{i}', last_name=f'Last{i}')
+            for i in range(users)
+        ],
+        batch_size=2000,
+    )
+    members = list(User.objects.filter(username__startswith='perf_').order_by('pk'))
+    UserProfile.objects.bulk_create([UserProfile(user=user, email=user.email) for user in members], batch_size=2000)
+    UserMembership.objects.bulk_create(
+        [UserMembership(user=user, plan=plans[i % len(plans)], status='active') for i, user in enumerate(members)],
+        batch_size=2000,
+    )
+    Payment.objects.bulk_create(
+        [
+            Payment(
+                user=user, plan=plans[i % len(plans)], amount=plans[i % len(plans)].price, status='succeeded',
+                stripe_payment_intent_id=f'pi_perf_{i}_{n}', description='Membership',
+            )
+            for i, user in enumerate(members) for n in range(payments)
+        ],
+        batch_size=2000,
+    )
+    ActivityLog.objects.bulk_create(
+        [ActivityLog(user=user, action='login', description='Logged in') for user in members for _ in range(activity)],
+        batch_size=2000,
+    )
+    MemberDirectory.objects.bulk_create(
+        [
+            MemberDirectory(
+                user=user,
+                association=associations[i % len(associations)],
+                job_title=TITLES[i % len(TITLES)],
+                company=f'Company {i % 50}',
+                expertise=', '.join(SKILLS[(i + k) % len(SKILLS)] for k in range(3)),
+                verification_status='verified',
+            )
+            for i, user in enumerate(members)
+        ],
+        batch_size=2000,
+    )
+    skill_ids = {}
+    for name in SKILLS:
+        skill_ids[name] = Skill.objects.get_or_create(slug=name, defaults={'name': name.title()})[0].pk
+    MemberSkill.objects.bulk_create(
+        [
+            MemberSkill(member_id=member_id, skill_id=skill_ids[name.strip()], position=position, is_visible=True)
+            for member_id, expertise in MemberDirectory.objects.filter(user__in=members).values_list('pk', 'expertise')
+            for position, name in enumerate(expertise.split(','))
+        ],
+        batch_size=2000,
+    )
+
+    now = timezone.now()
+    upcoming = IndustryEvent.objects.bulk_create([
+        IndustryEvent(
+            association=associations[i % len(associations)], title=f'Event {i}', description='', event_type='webinar',
+            start_date=now + timedelta(days=i + 1), end_date=now + timedelta(days=i + 1, hours=2), is_virtual=True,
+        )
+        for i in range(events)
+    ])
+    CertificationProgram.objects.bulk_create([
+        CertificationProgram(
+            association=associations[i % len(associations)], name=f'Certification {i}', description='',
+            requirements='', exam_fee=Decimal('100.00'), validity_period=12,
+        )
+        for i in range(events)
+    ])
+
+    # Bulk inserts skip the signals that keep these in step
+    recount()
+    skills.recount()
+    if search.available():
+        search.rebuild()
+
+    admin = User.objects.create_superuser('perf_admin', 'perf_admin@example.com', None)
+    UserProfile.objects.create(user=admin, user_type='admin')
+    return {
+        'member': members[0],
+        'admin': admin,
+        'plan': plans[-1],
+        'payment': Payment.objects.filter(user=members[0]).first(),
+        'event': upcoming[0],
+    }
+
+
+def measure(data, repeat=3):
+    """Hit every route cold (caches cleared) and record its query count, SQL time and wall time.
+
+    Returns {label: {'status': int, 'queries': int, 'sql_ms': float, 'wall_ms': float}},
+    the query count being the highest seen and the times the median of `repeat` runs.
+    """
+    results = {}
+    # Expected 404/500s would otherwise log a traceback per repeat
+    request_logger = logging.getLogger('django.request')
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        for label, name, kwargs, query, who in ROUTES:
+            results[label] = _measure_route(data, name, kwargs, query, who, repeat)
+    finally:
+        request_logger.setLevel(level)
+    return results
+
+
+def _measure_route(data, name, kwargs, query, who, repeat):
+    url = reverse(name, kwargs=kwargs(data) if kwargs else None)
+    if query:
+        url += '?' + (query(data) if callable(query) else query)
+
+    status, counts, sql_times, wall_times = None, [], [], []
+    for _ in range(repeat):
+        client = _client(data, who)
+        cache.clear()
+        catalog.reset_local()
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            status = client.get(url).status_code
+            wall = time.perf_counter() - started
+        counts.append(timer.count)
+        sql_times.append(timer.elapsed)
+        wall_times.append(wall)
+    return {
+        'status': status,
+        'queries': max(counts),
+        'sql_ms': round(statistics.median(sql_times) * 1000, 2),
+        'wall_ms': round(statistics.median(wall_times) * 1000, 2),
+    }
+
+
+def check(results, budget, timings=True):
+    """Budget breaches as human-readable strings; routes missing from the budget count as breaches"""
+    breaches = []
+    for label, result in results.items():
+        limits = budget.get(label)
+        if limits is None:
+            breaches.append(f'{label}: no budget')
+            continue
+        if 'status' in limits and result['status'] != limits['status']:
+            breaches.append(f'{label}: status {result["status"]}, expected {limits["status"]}')
+        metrics = ('queries', 'sql_ms', 'wall_ms') if timings else ('queries',)
+        for metric in metrics:
+            if metric in limits and result[metric] > limits[metric]:
+                breaches.append(f'{label}: {metric} {result[metric]} > {limits[metric]}')
+    return breaches
+
+
+def load_budget(path=BUDGET_FILE):
+    with open(path) as f:
+        return json.load(f)['routes']
+
+
+def save_budget(results, path=BUDGET_FILE, headroom=2.0):
+    """Write a budget from a run: exact query counts, timings with `headroom` times the measured value"""
+    routes = {
+        label: {
+            'status': result['status'],
+            'queries': result['queries'],
+            'sql_ms': round(max(result['sql_ms'] * headroom, 5), 1),
+            'wall_ms': round(max(result['wall_ms'] * headroom, 50), 1),
+        }
+        for label, result in results.items()
+    }
+    with open(path, 'w') as f:
+        json.dump({'routes': routes}, f, indent=2)
+        f.write('\n')
+
+
+def load_history(path=HISTORY_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def record(results, path=HISTORY_FILE, **meta):
+    """Append a run to the history file, keeping the last HISTORY_RUNS"""
+    history = load_history(path)
+    history.append({'at': timezone.now().isoformat(timespec='seconds'), **meta, 'routes': results})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(history[-HISTORY_RUNS:], f, indent=2)
+    return history[-HISTORY_RUNS:]
+
+
+def table(history, budget):
+    """Rows comparing the latest run with the previous one and the budget"""
+    latest = history[-1]['routes']
+    previous = history[-2]['routes'] if len(history) > 1 else {}
+    header = f'{"route":<28} {"status":>6} {"queries":>7} {"budget":>6} {"sql ms":>8} {"wall ms":>8} {"prev wall":>9} {"change":>7}'
+    lines = [header, '-' * len(header)]
+    for label, result in latest.items():
+        limits = budget.get(label, {})
+        before = previous.get(label)
+        change = ''
+        if before and before['wall_ms']:
+            change = f'{(result["wall_ms"] - before["wall_ms"]) / before["wall_ms"] * 100:+.0f}%'
+        lines.append(
+            f'{label:<28} {result["status"]:>6} {result["queries"]:>7} {limits.get("queries", "-"):>6} {result["sql_ms"]:>8.1f} '
+            f'{result["wall_ms"]:>8.1f} {before["wall_ms"] if before else "-":>9} {change:>7}'
+        )
+    return lines
+
+
+def _client(data, who):
+    # Errors are measured like any other response; the budget pins the expected status
+    client = Client(raise_request_exception=False)
+    if who == 'reset':
+        # The password reset steps only render with an email in the session
+        session = client.session
+        session['reset_email'] = data['member'].email
+        session['confirmation_code'] = '123456'
+        session.save()
+    elif who:
+        client.force_login(data[who])
+    return client
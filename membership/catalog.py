@@ -0,0 +1,83 @@
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .billing import CONVERSION_RATES
+from .models import MembershipPlan
+
+VERSION_KEY = 'plan_catalog:version'
+
+CENTS = Decimal('0.01')
+
+# Last catalog this process loaded. Reused for PLAN_CATALOG_LOCAL_TTL seconds without asking the
+# shared cache, so another process's invalidate() reaches this one within that time.
+_local = {'version': None, 'plans': None, 'checked': None}
+
+
+def convert_price(price, currency):
+    """Plan price (stored in USD) in the given checkout currency"""
+    return (Decimal(price) * Decimal(str(CONVERSION_RATES[currency]))).quantize(CENTS)
+
+
+def active_plans():
+    """Active plans ordered by price, with `features_list` and `prices` precomputed"""
+    now = time.monotonic()
+    checked = _local['checked']
+    if checked is not None and now - checked < getattr(settings, 'PLAN_CATALOG_LOCAL_TTL', 5):
+        return _local['plans']
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = _bump()
+    if _local['version'] == version:
+        _local['checked'] = now
+        return _local['plans']
+
+    key = f'plan_catalog:v{version}'
+    plans = cache.get(key)
+    if plans is None:
+        plans = _build()
+        cache.set(key, plans, getattr(settings, 'PLAN_CATALOG_TIMEOUT', 3600))
+    _local.update(version=version, plans=plans, checked=now)
+    return plans
+
+
+def get_plan(plan_id=None, tier=None):
+    """Look up an active plan by id or tier, or None"""
+    for plan in active_plans():
+        if plan.id == plan_id or (tier is not None and plan.tier == tier):
+            return plan
+    return None
+
+
+def invalidate():
+    """Drop the catalog everywhere by moving to a new version key"""
+    reset_local()
+    _bump()
+    # Bump again at commit so a rebuild that read pre-commit rows is discarded
+    transaction.on_commit(_bump)
+    transaction.on_commit(reset_local)
+
+
+def reset_local():
+    """Forget this process's copy, so the next read checks the shared version"""
+    _local.update(version=None, plans=None, checked=None)
+
+
+def _bump():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+        return cache.get(VERSION_KEY)
+
+
+def _build():
+    plans = list(MembershipPlan.objects.filter(is_active=True).order_by('price'))
+    for plan in plans:
+        plan.features_list = plan.get_features_list()
+        plan.prices = {currency: convert_price(plan.price, currency) for currency in CONVERSION_RATES}
+    return plans
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Warning, register
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """The dashboard, catalog, counter and notification caches are invalidated from job workers and
+    commands, so a cache private to each process would leave web workers serving stale data."""
+    if getattr(settings, 'TESTING', False) or not isinstance(caches['default'], LocMemCache):
+        return []
+    return [Error(
+        'The default cache is local to each process.',
+        hint='Set CACHE_URL to redis://... or db://table_name (see core/cache.py).',
+        id='membership.E001',
+    )]
+
+
+@register(deploy=True)
+def production_cache_check(app_configs, **kwargs):
+    """The database cache is shared but turns every warm read into a query, and its incr() is a
+    read followed by a write, so two concurrent version bumps can lose an invalidation."""
+    if not isinstance(caches['default'], DatabaseCache):
+        return []
+    return [Warning(
+        'The default cache is the database cache, a development fallback.',
+        hint='Set CACHE_URL to redis://... for query-free cached pages and atomic version bumps.',
+        id='membership.W001',
+    )]
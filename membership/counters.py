@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Counter, UserMembership, UserProfile
+
+CACHE_KEY = 'counters'
+
+# Counter name -> function computing the exact value with a full COUNT
+COUNTERS = {
+    'total_members': lambda: UserProfile.objects.filter(user_type='member').count(),
+    'active_members': lambda: UserMembership.objects.filter(status='active').count(),
+}
+
+
+def increment(name, delta=1):
+    """Adjust a counter in place. Runs in the caller's transaction."""
+    if not delta:
+        return
+    updated = Counter.objects.filter(name=name).update(value=F('value') + delta)
+    if not updated:
+        # First use: seed from a full count, which already includes this change
+        _seed(name)
+    cache.delete(CACHE_KEY)
+
+
+def get_counts(*names):
+    """Return {name: value} for the requested counters in a single query"""
+    names = names or tuple(COUNTERS)
+    counts = dict(Counter.objects.filter(name__in=names).values_list('name', 'value'))
+    for name in names:
+        if name not in counts:
+            counts[name] = _seed(name)
+    return counts
+
+
+def cached_counts():
+    """Every counter, from the cache when possible (dropped on each change, and after a short timeout)"""
+    counts = cache.get(CACHE_KEY)
+    if counts is None:
+        counts = get_counts()
+        cache.set(CACHE_KEY, counts, getattr(settings, 'COUNTERS_CACHE_TIMEOUT', 60))
+    return counts
+
+
+def recount():
+    """Recompute every counter from the source tables. Returns {name: (old, new)}."""
+    changes = {}
+    with transaction.atomic():
+        for name, compute in COUNTERS.items():
+            counter, _ = Counter.objects.select_for_update().get_or_create(name=name)
+            value = compute()
+            changes[name] = (counter.value, value)
+            if counter.value != value:
+                counter.value = value
+                counter.save(update_fields=['value', 'updated_at'])
+    cache.delete(CACHE_KEY)
+    return changes
+
+
+def _seed(name):
+    value = COUNTERS[name]()
+    try:
+        with transaction.atomic():
+            Counter.objects.create(name=name, value=value)
+    except IntegrityError:
+        # Seeded concurrently; the other writer's value is just as fresh
+        value = Counter.objects.get(name=name).value
+    return value
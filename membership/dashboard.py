@@ -0,0 +1,76 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import catalog
+from .counters import cached_counts
+from .models import ActivityLog, Payment, UserMembership, UserProfile
+
+
+def version_key(user_id):
+    return f'dashboard:version:{user_id}'
+
+
+def get_dashboard(user):
+    """Everything the member dashboard renders, cached per user.
+
+    The cache key carries the user's version (bumped by signals whenever
+    their profile, membership, payments or activity change) and the plan
+    catalog version, so a warm dashboard needs no queries at all.
+    """
+    user_key = version_key(user.pk)
+    versions = cache.get_many([user_key, catalog.VERSION_KEY])
+    version = versions.get(user_key) or _reset(user.pk)
+    key = f'dashboard:{user.pk}:v{version}:p{versions.get(catalog.VERSION_KEY, 0)}'
+
+    data = cache.get(key)
+    if data is None:
+        data = _build(user)
+        cache.set(key, data, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 600))
+    counts = cached_counts()
+    return {**data, 'total_members': counts['total_members'], 'active_members': counts['active_members']}
+
+
+def invalidate(user_id):
+    """Drop a user's cached dashboard"""
+    _bump(user_id)
+    # Bump again at commit so a rebuild that read pre-commit rows is discarded
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+def invalidate_many(user_ids):
+    """Drop many users' cached dashboards with one cache call (and one more at commit)"""
+    keys = [version_key(user_id) for user_id in user_ids]
+    # A missing version is replaced by a fresh one, which leaves the old entries unreachable
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _build(user):
+    profile = UserProfile.objects.filter(user=user).first()
+    membership = UserMembership.objects.select_related('plan').filter(user=user).first()
+    if profile is None or membership is None:
+        # Not set up yet; the view prompts them to finish
+        return {'user_profile': None, 'user_membership': None, 'payments': [], 'recent_activity': []}
+    return {
+        'user_profile': profile,
+        'user_membership': membership,
+        'payments': list(Payment.objects.filter(user=user).order_by('-created_at')[:5]),
+        'recent_activity': list(ActivityLog.objects.filter(user=user).order_by('-timestamp')[:10]),
+    }
+
+
+def _bump(user_id):
+    try:
+        return cache.incr(version_key(user_id))
+    except ValueError:
+        return _reset(user_id)
+
+
+def _reset(user_id):
+    # A fresh, never-used version so entries cached before eviction stay unreachable
+    version = time.time_ns()
+    cache.set(version_key(user_id), version, None)
+    return version
@@ -0,0 +1,67 @@
+"""
+Offline stand-in for the parts of the `stripe` library this app uses.
+
+Enabled with settings.STRIPE_FAKE. Behaviour follows Stripe's test tokens:
+`tok_chargeDeclined` raises a CardError, `tok_apiError` raises an
+APIConnectionError (so the job is retried), anything else succeeds.
+Charges are deduplicated by idempotency key like the real API, and
+sign_webhook() signs recorded webhook events the way Stripe does.
+"""
+import hashlib
+import hmac
+import threading
+import time
+import uuid
+
+from stripe import error
+
+_lock = threading.Lock()
+_charges_by_key = {}
+
+# Artificial latency (seconds) to mimic the Stripe round-trip
+latency = 0
+
+
+class FakeStripeObject(dict):
+    __getattr__ = dict.get
+
+
+class Charge:
+    @staticmethod
+    def create(amount, currency, source, description='', idempotency_key=None, **kwargs):
+        if latency:
+            time.sleep(latency)
+
+        with _lock:
+            if idempotency_key and idempotency_key in _charges_by_key:
+                return _charges_by_key[idempotency_key]
+
+        if source == 'tok_chargeDeclined':
+            raise error.CardError('Your card was declined.', param=None, code='card_declined')
+        if source == 'tok_apiError':
+            raise error.APIConnectionError('Could not connect to Stripe.')
+
+        charge = FakeStripeObject(
+            id=f'ch_fake_{uuid.uuid4().hex[:24]}',
+            object='charge',
+            amount=amount,
+            currency=currency,
+            description=description,
+            status='succeeded',
+        )
+        with _lock:
+            # Another thread may have raced us with the same key
+            charge = _charges_by_key.setdefault(idempotency_key, charge) if idempotency_key else charge
+        return charge
+
+
+def reset():
+    with _lock:
+        _charges_by_key.clear()
+
+
+def sign_webhook(payload, secret, timestamp=None):
+    """A Stripe-Signature header for `payload`, as Stripe would send it"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    mac = hmac.new(secret.encode('utf-8'), f'{timestamp}.{payload}'.encode('utf-8'), hashlib.sha256)
+    return f't={timestamp},v1={mac.hexdigest()}'
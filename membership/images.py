@@ -0,0 +1,141 @@
+import hashlib
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import dashboard
+from .jobs import PermanentJobError, enqueue
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> (longest side in px, crop to a square)
+SIZES = {
+    'avatar': (64, True),
+    'card': (200, True),
+    'full': (800, False),
+}
+
+# Format -> (file extension, PIL save options)
+FORMATS = {
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+DERIVED_DIR = 'profile_pictures/derived'
+
+# The field default every profile starts with; it has no job of its own, since all such profiles
+# share one set of variants made from DEFAULT_PICTURE_FILE by `manage.py backfill_picture_variants`
+DEFAULT_PICTURE = UserProfile._meta.get_field('profile_picture').default
+DEFAULT_PICTURE_FILE = 'profile_pictures/default.png.jpeg'
+
+# This process's view of the default picture: its content digest, and its variant URLs once written
+_default = {'digest': None, 'variants': None}
+
+
+def queue_profile_picture(profile, dedupe_key=None):
+    """Queue thumbnail generation for the profile's current picture"""
+    return enqueue('membership.images.process_profile_picture', {
+        'profile_id': profile.pk,
+        'name': profile.profile_picture.name,
+    }, dedupe_key=dedupe_key)
+
+
+def is_default(name):
+    return name == DEFAULT_PICTURE
+
+
+def default_variants():
+    """The default picture's variant URLs, or {} until they have been written"""
+    if _default['variants'] is None:
+        digest = _default_digest()
+        if digest is None:
+            return {}
+        names = _variant_names(digest)
+        if not all(default_storage.exists(name) for formats in names.values() for name in formats.values()):
+            return {}
+        _default['variants'] = _urls(names)
+    return dict(_default['variants'])
+
+
+def build_default_variants():
+    """Write the default picture's variants (only the missing ones) and return their URLs"""
+    with default_storage.open(DEFAULT_PICTURE_FILE, 'rb') as f:
+        source = f.read()
+    _default['variants'] = build_variants(source)
+    return dict(_default['variants'])
+
+
+def process_profile_picture(payload, job=None):
+    """Job handler: write the resized variants and record their URLs on the profile"""
+    profile = UserProfile.objects.filter(pk=payload['profile_id']).only('user_id', 'profile_picture').first()
+    if profile is None or profile.profile_picture.name != payload['name']:
+        # Deleted, or replaced by a newer upload with its own job
+        return
+
+    try:
+        with profile.profile_picture.open('rb') as f:
+            source = f.read()
+    except FileNotFoundError as e:
+        raise PermanentJobError(f'Profile picture {payload["name"]} is missing') from e
+
+    variants = build_variants(source)
+    # Only write if the picture was not replaced while we were resizing
+    if UserProfile.objects.filter(pk=profile.pk, profile_picture=payload['name']).update(picture_variants=variants):
+        dashboard.invalidate(profile.user_id)
+
+
+def build_variants(source):
+    """Write every size/format of an image under content-hash names. Returns {size: {format: url}}."""
+    names = _variant_names(hashlib.sha256(source).hexdigest()[:16])
+    pending = [(size, fmt) for size in SIZES for fmt in FORMATS if not default_storage.exists(names[size][fmt])]
+    if pending:
+        try:
+            image = Image.open(io.BytesIO(source))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+        except (UnidentifiedImageError, OSError) as e:
+            raise PermanentJobError(f'Cannot read image: {e}') from e
+
+        for size, fmt in pending:
+            names[size][fmt] = default_storage.save(names[size][fmt], ContentFile(_encode(image, size, fmt)))
+        logger.info('Wrote %s profile picture variant(s) for %s', len(pending), names['full']['jpeg'])
+
+    return _urls(names)
+
+
+def _variant_names(digest):
+    return {
+        size: {fmt: posixpath.join(DERIVED_DIR, f'{digest}-{size}.{ext}') for fmt, (ext, _) in FORMATS.items()}
+        for size in SIZES
+    }
+
+
+def _urls(names):
+    return {size: {fmt: default_storage.url(name) for fmt, name in formats.items()} for size, formats in names.items()}
+
+
+def _default_digest():
+    # Read once per process; the file only changes with a deploy
+    if _default['digest'] is None:
+        try:
+            with default_storage.open(DEFAULT_PICTURE_FILE, 'rb') as f:
+                _default['digest'] = hashlib.sha256(f.read()).hexdigest()[:16]
+        except FileNotFoundError:
+            return None
+    return _default['digest']
+
+
+def _encode(image, size, fmt):
+    side, square = SIZES[size]
+    if square:
+        resized = ImageOps.fit(image, (side, side), Image.LANCZOS)
+    else:
+        resized = image.copy()
+        resized.thumbnail((side, side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, format=fmt.upper(), **FORMATS[fmt][1])
+    return buffer.getvalue()
@@ -0,0 +1,104 @@
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot succeed"""
+
+
+def enqueue(task, payload=None, dedupe_key=None, run_after=None, max_attempts=None):
+    """Queue a background job. A job with the same dedupe_key is only queued once."""
+    job = Job(
+        task=task,
+        payload=payload or {},
+        dedupe_key=dedupe_key,
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 5),
+    )
+    if dedupe_key is None:
+        job.save()
+        return job
+
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        job = Job.objects.get(dedupe_key=dedupe_key)
+    return job
+
+
+def claim(worker, limit=1):
+    """Atomically mark up to `limit` due jobs as running for this worker and return them"""
+    now = timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'
+    with transaction.atomic():
+        due = Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        # The status guard makes the claim safe on backends without row locks (SQLite)
+        Job.objects.filter(id__in=ids, status='queued').update(
+            status='running',
+            locked_by=token,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, locked_by=token, status='running'))
+
+
+def requeue_stale(stale_after=None):
+    """Put jobs whose worker died mid-run back on the queue"""
+    stale_after = stale_after or getattr(settings, 'JOB_STALE_AFTER', 600)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_by='', locked_at=None
+    )
+
+
+def run_job(job):
+    """Run a claimed job, recording success, scheduling a retry or marking it failed"""
+    try:
+        handler = import_string(job.task)
+        handler(job.payload, job=job)
+    except Exception as e:
+        logger.exception('Job %s (%s) failed on attempt %s', job.id, job.task, job.attempts)
+        job.last_error = traceback.format_exc()
+        if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            _call_failure_hook(job)
+        else:
+            delay = getattr(settings, 'JOB_RETRY_DELAY', 10) * (2 ** (job.attempts - 1))
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+    else:
+        job.status = 'succeeded'
+        job.last_error = ''
+    finally:
+        job.locked_by = ''
+        job.locked_at = None
+        job.save(update_fields=['status', 'payload', 'last_error', 'run_after', 'locked_by', 'locked_at', 'updated_at'])
+    return job
+
+
+def _call_failure_hook(job):
+    # A handler can define `<handler>.on_failure(payload, job)` to clean up after the last attempt
+    try:
+        hook = getattr(import_string(job.task), 'on_failure', None)
+        if hook is not None:
+            hook(job.payload, job=job)
+    except Exception:
+        logger.exception('Failure hook for job %s raised', job.id)
@@ -0,0 +1,101 @@
+"""
+Period-end transitions for UserMembership, run by `manage.py sweep_memberships`.
+
+Renewals themselves come from Stripe (see webhooks.py), which moves
+`current_period_end` forward; the sweeper only acts on periods that ended:
+
+- `cancel_at_period_end` memberships become cancelled once the period ends.
+- Other memberships lapse to inactive when the period ended more than
+  MEMBERSHIP_GRACE_PERIOD ago without a renewal.
+
+Each chunk is claimed, updated with one set-based UPDATE and logged with
+bulk inserts in its own transaction, so memory stays bounded by the chunk
+size and concurrent sweepers never transition the same row twice.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from . import counters, dashboard, notifications
+from .models import ActivityLog, Notification, UserMembership
+
+# Statuses a period end can still act on
+LIVE_STATUSES = ('active', 'pending')
+
+# name -> (condition besides the period end, new status, activity description, notification title, message)
+TRANSITIONS = {
+    'cancelled': (
+        Q(cancel_at_period_end=True),
+        'cancelled',
+        'Membership ended at the close of the billing period',
+        'Your membership has ended',
+        'Your cancellation took effect at the end of your billing period. You can rejoin at any time.',
+    ),
+    'expired': (
+        Q(cancel_at_period_end=False),
+        'inactive',
+        'Membership expired without renewal',
+        'Your membership has expired',
+        'We could not renew your membership. Choose a plan to restore your access.',
+    ),
+}
+
+
+def sweep(now=None, chunk_size=None, grace=None):
+    """Apply every due transition. Returns {transition name: memberships changed}."""
+    now = now or timezone.now()
+    chunk_size = chunk_size or getattr(settings, 'MEMBERSHIP_SWEEP_CHUNK_SIZE', 2000)
+    if grace is None:
+        grace = timedelta(seconds=getattr(settings, 'MEMBERSHIP_GRACE_PERIOD', 3 * 24 * 3600))
+    cutoffs = {'cancelled': now, 'expired': now - grace}
+    return {name: transition(name, cutoffs[name], now, chunk_size) for name in TRANSITIONS}
+
+
+def transition(name, cutoff, now, chunk_size):
+    """Move every live membership whose period ended by `cutoff` through TRANSITIONS[name], chunk by chunk"""
+    condition, status, description, title, message = TRANSITIONS[name]
+    link = reverse('membership_plans')
+    changed = 0
+    while True:
+        with transaction.atomic():
+            rows = _claim(condition, cutoff, chunk_size)
+            if not rows:
+                break
+            ids = [pk for pk, _, _ in rows]
+            user_ids = [user_id for _, user_id, _ in rows]
+            # The status guard keeps the UPDATE correct on backends without row locks (SQLite)
+            UserMembership.objects.filter(pk__in=ids, status__in=LIVE_STATUSES).update(
+                status=status, cancel_at_period_end=False, updated_at=now,
+            )
+            ActivityLog.objects.bulk_create(
+                [ActivityLog(user_id=user_id, action='membership_change', description=description) for user_id in user_ids],
+                batch_size=chunk_size,
+            )
+            Notification.objects.bulk_create(
+                [
+                    Notification(user_id=user_id, notification_type='warning', title=title, message=message, link=link)
+                    for user_id in user_ids
+                ],
+                batch_size=chunk_size,
+            )
+            notifications.bump_unread(user_ids)
+            # A set-based UPDATE skips the save signals that keep these in sync
+            counters.increment('active_members', -sum(old == 'active' for _, _, old in rows))
+            dashboard.invalidate_many(user_ids)
+        changed += len(rows)
+    return changed
+
+
+def _claim(condition, cutoff, limit):
+    # A range scan of usermembership_period_end_idx per live status. Unordered, so each chunk
+    # reads only the rows it takes instead of sorting everything that is due.
+    due = UserMembership.objects.filter(
+        condition, status__in=LIVE_STATUSES, current_period_end__lte=cutoff,
+    ).order_by()
+    if connection.features.has_select_for_update_skip_locked:
+        due = due.select_for_update(skip_locked=True)
+    return list(due.values_list('pk', 'user_id', 'status')[:limit])
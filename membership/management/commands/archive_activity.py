@@ -0,0 +1,24 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from membership.archive import archive_activity, archive_dir
+
+
+class Command(BaseCommand):
+    help = 'Move activity log rows past the retention period to gzipped files under ACTIVITY_ARCHIVE_DIR (run on a schedule)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive rows older than this many days (default ACTIVITY_LOG_RETENTION_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows written and deleted per step (default ACTIVITY_ARCHIVE_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days']) if options['days'] is not None else None
+        started = time.perf_counter()
+        moved = archive_activity(before=before, chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} activity row(s) to {archive_dir()} in {elapsed:.1f}s'))
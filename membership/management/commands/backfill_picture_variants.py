@@ -0,0 +1,49 @@
+import hashlib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from membership import dashboard, images
+from membership.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = ('Give profiles that predate resizing their picture variants: the default picture is resized once '
+            'and shared, uploads are queued for the job worker')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Profiles updated or queued per step')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        missing = UserProfile.objects.filter(picture_variants={}).exclude(profile_picture='').order_by('pk')
+
+        try:
+            variants = images.build_default_variants()
+        except FileNotFoundError:
+            raise CommandError(f'The default picture {images.DEFAULT_PICTURE_FILE} is missing from storage.')
+        defaulted = missing.filter(profile_picture=images.DEFAULT_PICTURE)
+        shared = 0
+        while True:
+            rows = list(defaulted.values_list('pk', 'user_id')[:batch_size])
+            if not rows:
+                break
+            # A set-based UPDATE skips the save signals, so drop the cached dashboards here
+            shared += UserProfile.objects.filter(pk__in=[pk for pk, _ in rows]).update(picture_variants=variants)
+            dashboard.invalidate_many([user_id for _, user_id in rows])
+
+        queued, after = 0, 0
+        uploads = missing.exclude(profile_picture=images.DEFAULT_PICTURE).only('pk', 'profile_picture')
+        while True:
+            profiles = list(uploads.filter(pk__gt=after)[:batch_size])
+            if not profiles:
+                break
+            for profile in profiles:
+                # Keyed by picture, so running the backfill again does not queue it twice
+                picture = hashlib.sha256(profile.profile_picture.name.encode()).hexdigest()[:16]
+                images.queue_profile_picture(profile, dedupe_key=f'picture-variants:{profile.pk}:{picture}')
+            queued += len(profiles)
+            after = profiles[-1].pk
+
+        self.stdout.write(f'Default picture variants shared with {shared} profile(s)')
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} uploaded picture(s) for resizing; run `manage.py run_jobs`'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from membership.revenue import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily revenue rollup from the full payment history'
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} revenue rollup row(s)'))
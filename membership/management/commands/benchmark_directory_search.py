@@ -0,0 +1,84 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from membership.models import MemberDirectory, ProfessionalAssociation
+from membership.search import available, orm_search, rebuild, search
+
+TITLES = ['Software Engineer', 'Data Scientist', 'Product Manager', 'Accountant', 'Nurse', 'Architect']
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries']
+SKILLS = ['python', 'django', 'sql', 'leadership', 'finance', 'design', 'cloud', 'statistics']
+INDUSTRIES = ['Technology', 'Healthcare', 'Finance']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare the full-text directory search with the ORM LIKE scan on synthetic members (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--queries', nargs='+', default=['python', 'data sci', 'globex', 'zzz'])
+
+    def handle(self, *args, **options):
+        if not available():
+            raise CommandError('The full-text index requires SQLite with FTS5')
+        try:
+            with transaction.atomic():
+                self._seed(options['members'])
+                started = time.perf_counter()
+                rebuild()
+                self.stdout.write(f'Index rebuild: {time.perf_counter() - started:.2f}s')
+                for query in options['queries']:
+                    self._compare(query, options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, count):
+        self.stdout.write(f'Creating {count} synthetic members...')
+        associations = [
+            ProfessionalAssociation.objects.create(name=f'Bench {industry}', description='', industry=industry)
+            for industry in INDUSTRIES
+        ]
+        User.objects.bulk_create(
+            [User(username=f'bench_{i}', first_name=f'First{i}', last_name=f'Last{i}') for i in range(count)],
+            batch_size=2000,
+        )
+        users = User.objects.filter(username__startswith='bench_').values_list('pk', flat=True)
+        MemberDirectory.objects.bulk_create(
+            [
+                MemberDirectory(
+                    user_id=user_id,
+                    association=associations[i % len(associations)],
+                    job_title=TITLES[i % len(TITLES)],
+                    company=COMPANIES[i % len(COMPANIES)],
+                    expertise=', '.join(SKILLS[(i + k) % len(SKILLS)] for k in range(3)),
+                    verification_status='verified',
+                )
+                for i, user_id in enumerate(users.iterator())
+            ],
+            batch_size=2000,
+        )
+
+    def _compare(self, query, repeat):
+        # The old view rendered every match, unordered; the index returns the top ranked page
+        orm = self._time(lambda: list(orm_search(query).values_list('pk', flat=True)), repeat)
+        fts = self._time(lambda: search(query, limit=200), repeat)
+        self.stdout.write(
+            f'{query!r:>12}: ORM {orm * 1000:8.1f} ms   FTS5 {fts * 1000:8.1f} ms   ({orm / fts:.1f}x)'
+        )
+
+    def _time(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.database import database_config
+
+SCHEMA = '''
+CREATE TABLE activity (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    action VARCHAR(20) NOT NULL,
+    description TEXT NOT NULL,
+    timestamp DATETIME NOT NULL
+);
+CREATE INDEX activity_user_time ON activity (user_id, timestamp DESC);
+'''
+
+# The settings this project used before core/database.py
+BEFORE = 'PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL;PRAGMA busy_timeout=20000'
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent SQLite writes and reads under the old rollback journal and the current WAL pragmas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writes', type=int, default=250, help='Transactions per writer')
+        parser.add_argument('--rows', type=int, default=20000, help='Rows loaded before the run')
+
+    def handle(self, *args, **options):
+        after = database_config(sqlite_path='unused')['OPTIONS']['init_command']
+        results = {}
+        for label, pragmas in (('before', BEFORE), ('after', after)):
+            with tempfile.TemporaryDirectory() as directory:
+                results[label] = self._run(os.path.join(directory, 'bench.db'), pragmas, options)
+            r = results[label]
+            self.stdout.write(
+                f'{label:>6}: {r["writes"]:7.0f} writes/s  {r["reads"]:8.0f} reads/s  '
+                f'write p50 {r["p50"]:6.2f} ms  p95 {r["p95"]:6.2f} ms  lock errors {r["errors"]}'
+            )
+            self.stdout.write(f'        {pragmas}')
+        before, after = results['before'], results['after']
+        self.stdout.write(self.style.SUCCESS(
+            f'Writes {after["writes"] / before["writes"]:.1f}x, reads {after["reads"] / max(before["reads"], 1):.1f}x'
+        ))
+
+    def _run(self, path, pragmas, options):
+        db = _connect(path, pragmas)
+        db.executescript(SCHEMA)
+        db.executemany(
+            'INSERT INTO activity (user_id, action, description, timestamp) VALUES (?, ?, ?, datetime())',
+            [(i % 1000, 'login', 'Logged in') for i in range(options['rows'])],
+        )
+        db.commit()
+        db.close()
+
+        latencies, errors, reads = [], [0], [0]
+        lock = threading.Lock()
+        writing = threading.Event()
+        writing.set()
+
+        def writer(n):
+            conn = _connect(path, pragmas)
+            own = []
+            for i in range(options['writes']):
+                started = time.perf_counter()
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.execute(
+                        'INSERT INTO activity (user_id, action, description, timestamp) VALUES (?, ?, ?, datetime())',
+                        (n * 1000 + i % 1000, 'payment', 'Payment succeeded'),
+                    )
+                    conn.execute('COMMIT')
+                except sqlite3.OperationalError:
+                    conn.rollback()
+                    with lock:
+                        errors[0] += 1
+                    continue
+                own.append(time.perf_counter() - started)
+            conn.close()
+            with lock:
+                latencies.extend(own)
+
+        def reader(n):
+            conn = _connect(path, pragmas)
+            done = 0
+            while writing.is_set():
+                try:
+                    conn.execute(
+                        'SELECT id, action FROM activity WHERE user_id = ? ORDER BY timestamp DESC LIMIT 10', (n,),
+                    ).fetchall()
+                    done += 1
+                except sqlite3.OperationalError:
+                    with lock:
+                        errors[0] += 1
+            conn.close()
+            with lock:
+                reads[0] += done
+
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(options['writers'])]
+        readers = [threading.Thread(target=reader, args=(n,)) for n in range(options['readers'])]
+        started = time.perf_counter()
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writing.clear()
+        for thread in readers:
+            thread.join()
+
+        latencies.sort()
+        return {
+            'writes': len(latencies) / elapsed,
+            'reads': reads[0] / elapsed,
+            'p50': statistics.median(latencies) * 1000 if latencies else 0,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+            'errors': errors[0],
+        }
+
+
+def _connect(path, pragmas):
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    for pragma in pragmas.split(';'):
+        conn.execute(pragma)
+    return conn
@@ -0,0 +1,63 @@
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from membership import budgets
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Hit every membership route against synthetic data (rolled back) and compare query counts, '
+        'SQL time and latency with membership/budgets.json'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--payments', type=int, default=20, help='Payments per user')
+        parser.add_argument('--activity', type=int, default=20, help='Activity entries per user')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--queries-only', action='store_true', help='Ignore the timing budgets')
+        parser.add_argument('--update', action='store_true', help='Rewrite the budget file from this run')
+        parser.add_argument('--label', default='', help='Name for this run in the history')
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], DatabaseCache):
+            # Measured as configured: each cache read and write is counted as a query
+            self.stderr.write(self.style.WARNING(
+                'The default cache is the database cache; budgets.json assumes Redis (set CACHE_URL)'
+            ))
+        # Test client host, locmem email backend
+        setup_test_environment()
+        try:
+            # Activity rows are written inline so none outlive the rollback
+            with override_settings(ACTIVITY_LOG_SYNC=True), transaction.atomic():
+                self.stdout.write(f'Seeding {options["users"]} synthetic members...')
+                data = budgets.seed(options['users'], options['payments'], options['activity'])
+                results = budgets.measure(data, options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            teardown_test_environment()
+
+        if options['update']:
+            budgets.save_budget(results)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {budgets.BUDGET_FILE}'))
+
+        budget = budgets.load_budget()
+        history = budgets.record(results, users=options['users'], label=options['label'])
+        for line in budgets.table(history, budget):
+            self.stdout.write(line)
+
+        breaches = budgets.check(results, budget, timings=not options['queries_only'])
+        if breaches:
+            for breach in breaches:
+                self.stderr.write(breach)
+            raise CommandError(f'{len(breaches)} budget breach(es)')
+        self.stdout.write(self.style.SUCCESS('All routes within budget'))
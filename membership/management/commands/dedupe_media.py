@@ -0,0 +1,55 @@
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from membership.storage import BLOB_DIR, path_digest
+
+TMP_SUFFIX = '.dedupe-tmp'
+
+
+class Command(BaseCommand):
+    help = 'Hard link identical files under MEDIA_ROOT to one shared blob and report the bytes reclaimed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be reclaimed')
+
+    def handle(self, *args, **options):
+        root = settings.MEDIA_ROOT
+        blob_root = os.path.join(root, BLOB_DIR)
+        groups = defaultdict(list)
+        for directory, dirnames, filenames in os.walk(root):
+            if os.path.abspath(directory) == os.path.abspath(root):
+                dirnames[:] = [d for d in dirnames if d != BLOB_DIR]
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                path = os.path.join(directory, filename)
+                groups[path_digest(path)].append(path)
+
+        reclaimed = linked = 0
+        for digest, paths in groups.items():
+            blob = os.path.join(blob_root, digest[:2], digest)
+            if not os.path.exists(blob):
+                if options['dry_run']:
+                    # The first copy would become the blob
+                    blob = paths[0]
+                else:
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    os.link(paths[0], blob)
+            for path in paths:
+                if os.path.samefile(path, blob):
+                    continue
+                stat = os.stat(path)
+                if stat.st_nlink == 1:
+                    reclaimed += stat.st_size
+                linked += 1
+                if not options['dry_run']:
+                    # Swap the copy for a link atomically
+                    os.link(blob, path + TMP_SUFFIX)
+                    os.replace(path + TMP_SUFFIX, path)
+
+        verb = 'Would reclaim' if options['dry_run'] else 'Reclaimed'
+        self.stdout.write(f'{sum(map(len, groups.values()))} file(s), {len(groups)} distinct, {linked} duplicate(s)')
+        self.stdout.write(self.style.SUCCESS(f'{verb} {reclaimed} bytes ({reclaimed / 1024 / 1024:.1f} MB)'))
@@ -0,0 +1,59 @@
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from membership.webhooks import claim, process, requeue_stale
+
+
+class Command(BaseCommand):
+    help = 'Apply stored Stripe webhook events to memberships and payments, in order per customer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Number of customers processed in parallel')
+        parser.add_argument('--batch', type=int, default=50,
+                            help='Customers claimed per round')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the inbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit as soon as the inbox is empty')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        processed = 0
+
+        self.stdout.write(f'Webhook worker {worker} started with concurrency {concurrency}')
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            try:
+                while True:
+                    requeue_stale()
+                    claimed = claim(worker, limit=max(options['batch'], concurrency))
+                    close_old_connections()
+                    if not claimed:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    # Customers run in parallel; each customer's events stay in order on one thread
+                    groups = claimed.values()
+                    results = pool.map(self._process, groups) if concurrency > 1 else map(process, groups)
+                    for events in results:
+                        processed += len(events)
+                        for event in events:
+                            self.stdout.write(f'{event.type} {event.event_id}: {event.status}')
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping worker')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} event(s)'))
+
+    def _process(self, events):
+        try:
+            return process(events)
+        finally:
+            close_old_connections()
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from membership.notifications import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete notifications whose expires_at has passed (run on a schedule)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows deleted per transaction (default NOTIFICATION_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        purged = purge_expired(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired notification(s)'))
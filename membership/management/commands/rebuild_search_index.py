@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from membership.search import available, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the member directory full-text search index'
+
+    def handle(self, *args, **options):
+        if not available():
+            self.stdout.write(self.style.WARNING('Full-text index is SQLite-only; directory search uses the ORM here'))
+            return
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {rows} directory member(s)'))
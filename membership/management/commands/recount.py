@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from membership import skills
+from membership.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized membership and skill counters from the source tables'
+
+    def handle(self, *args, **options):
+        for name, (old, new) in recount().items():
+            if old == new:
+                self.stdout.write(f'{name}: {new} (ok)')
+            else:
+                self.stdout.write(self.style.WARNING(f'{name}: {old} -> {new} (drift {new - old:+d})'))
+        fixed = skills.recount()
+        if fixed:
+            self.stdout.write(self.style.WARNING(f'skill member counts: {fixed} corrected'))
+        else:
+            self.stdout.write('skill member counts (ok)')
+        self.stdout.write(self.style.SUCCESS('Counters reconciled'))
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from membership.replicas import copy_sqlite, replica_aliases
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto each SQLite read replica (a local stand-in for replication)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep copying every this many seconds; 0 copies once')
+
+    def handle(self, *args, **options):
+        primary = _sqlite_path(DEFAULT_DB_ALIAS)
+        if primary is None:
+            raise CommandError('The primary database is not SQLite; use the database\'s own replication.')
+        targets = [(alias, _sqlite_path(alias)) for alias in replica_aliases()]
+        targets = [(alias, path) for alias, path in targets if path is not None]
+        if not targets:
+            raise CommandError('No SQLite replicas configured; set DATABASE_REPLICA_URLS=sqlite:///db.replica.sqlite3')
+
+        try:
+            while True:
+                for alias, path in targets:
+                    elapsed = copy_sqlite(primary, path)
+                    self.stdout.write(f'{alias}: copied in {elapsed * 1000:.0f} ms')
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping replication')
+
+
+def _sqlite_path(alias):
+    config = settings.DATABASES[alias]
+    if connections[alias].vendor != 'sqlite':
+        return None
+    return str(config['NAME'])
@@ -0,0 +1,55 @@
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from membership.jobs import claim, requeue_stale, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (payments, etc.)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Number of jobs to run in parallel')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit as soon as the queue is empty')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        processed = 0
+
+        self.stdout.write(f'Worker {worker} started with concurrency {concurrency}')
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            try:
+                while True:
+                    requeue_stale()
+                    jobs = claim(worker, limit=concurrency)
+                    close_old_connections()
+                    if not jobs:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    # A single worker runs jobs inline on the main thread
+                    results = pool.map(self._run, jobs) if concurrency > 1 else map(run_job, jobs)
+                    for job in results:
+                        processed += 1
+                        self.stdout.write(f'{job.task} #{job.id}: {job.status}')
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping worker')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s)'))
+
+    def _run(self, job):
+        try:
+            return run_job(job)
+        finally:
+            close_old_connections()
@@ -0,0 +1,315 @@
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from membership import revenue, search, skills
+from membership.counters import recount
+from membership.models import (
+    ActivityLog, IndustryEvent, MemberDirectory, MemberSkill, MembershipPlan, Payment, ProfessionalAssociation,
+    Skill, UserMembership, UserProfile,
+)
+
+FIRST_NAMES = ['James', 'Mary', 'Wei', 'Aisha', 'Carlos', 'Priya', 'Olga', 'Kenji', 'Fatima', 'Liam', 'Zoe', 'Noah']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Patel', 'Kim', 'Silva', 'Muller', 'Haddad', 'Jones']
+TITLES = ['Software Engineer', 'Data Scientist', 'Product Manager', 'Accountant', 'Nurse', 'Architect', 'Consultant']
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises', 'Soylent']
+SKILLS = ['Python', 'Django', 'SQL', 'Leadership', 'Finance', 'Design', 'Cloud', 'Statistics', 'Marketing', 'Nursing']
+INDUSTRIES = ['Technology', 'Healthcare', 'Finance', 'Engineering']
+ACTIONS = ['login', 'logout', 'payment', 'profile_update', 'membership_change']
+CURRENCIES = ['USD', 'EUR', 'GBP']
+MEMBERSHIP_STATUSES = ['active'] * 7 + ['inactive', 'pending', 'cancelled']
+PAYMENT_STATUSES = ['succeeded'] * 17 + ['failed', 'pending', 'refunded']
+
+# Users generated per worker task; each chunk is inserted in one transaction
+CHUNK_SIZE = 10000
+
+BATCH_SIZE = 2000
+
+HISTORY_DAYS = 730
+
+# Seeded usernames get a prefix of their own: easy to find or delete, and not the obvious user<n> a real sign-up might pick
+USERNAME_PREFIX = 'seed_user'
+
+# Inserted with ids handed out up front; their sequences must be moved past them afterwards
+EXPLICIT_ID_MODELS = (User, UserMembership, MemberDirectory)
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load synthetic users with profiles, memberships, payments, activity and directory entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--payments', type=float, default=3, help='Average payments per user')
+        parser.add_argument('--activity', type=float, default=5, help='Average activity entries per user')
+        parser.add_argument('--directory', type=float, default=0.3, help='Share of users listed in the directory')
+        parser.add_argument('--events', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=max(multiprocessing.cpu_count() - 1, 1))
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible datasets')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Do not rebuild counters, skill counts, the search index and the revenue rollup')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users must be positive')
+        plans = list(MembershipPlan.objects.filter(is_active=True).values_list('pk', 'price'))
+        if not plans:
+            raise CommandError('Create at least one active membership plan first')
+
+        associations = self._associations()
+        skill_ids = self._skills()
+        now = timezone.now()
+        # Ids are handed out up front so every worker can fill in foreign keys without a round trip
+        first = {
+            model: (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+            for model in EXPLICIT_ID_MODELS
+        }
+        context = {
+            'first_user': first[User],
+            'first_membership': first[UserMembership],
+            'first_directory': first[MemberDirectory],
+            'plans': [(pk, str(price)) for pk, price in plans],
+            'associations': associations,
+            'skills': skill_ids,
+            'now': now,
+            'password': make_password('password'),
+            'payments': options['payments'],
+            'activity': options['activity'],
+            'directory': options['directory'],
+            'seed': options['seed'],
+        }
+        chunks = [
+            (context, start, min(CHUNK_SIZE, options['users'] - start))
+            for start in range(0, options['users'], CHUNK_SIZE)
+        ]
+
+        pool = None
+        if options['workers'] > 1 and len(chunks) > 1:
+            # Forked workers must not inherit an open database connection
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(options['workers'])
+        # In order, so ids stay ascending; generating the next chunks overlaps the inserts
+        generated = pool.imap(_generate_chunk, chunks) if pool else map(_generate_chunk, chunks)
+
+        totals = {}
+        started = time.perf_counter()
+        try:
+            with _fast_inserts():
+                for statements in generated:
+                    with transaction.atomic(), connection.cursor() as cursor:
+                        for name, sql, rows in statements:
+                            for i in range(0, len(rows), BATCH_SIZE):
+                                cursor.executemany(sql, rows[i:i + BATCH_SIZE])
+                            totals[name] = totals.get(name, 0) + len(rows)
+                    inserted = sum(totals.values())
+                    self.stdout.write(
+                        f'  {totals["User"]:>10,} users  {inserted:>12,} rows  '
+                        f'{inserted / (time.perf_counter() - started):>10,.0f} rows/s'
+                    )
+                totals['IndustryEvent'] = self._events(options['events'], associations, now, options['seed'])
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        _reset_sequences()
+        elapsed = time.perf_counter() - started
+
+        for name, count in totals.items():
+            self.stdout.write(f'{name:>16}: {count:,}')
+        inserted = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {inserted:,} rows in {elapsed:.1f}s ({inserted / elapsed:,.0f} rows/s, '
+            f'{totals["User"] / elapsed:,.0f} users/s)'
+        ))
+
+        if not options['skip_derived']:
+            # bulk_create skips the signals that keep these in step
+            started = time.perf_counter()
+            recount()
+            skills.recount()
+            search.rebuild()
+            revenue.rebuild()
+            self.stdout.write(f'Rebuilt counters, skill counts, search index and revenue rollup in '
+                              f'{time.perf_counter() - started:.1f}s')
+
+    def _associations(self):
+        associations = dict(
+            ProfessionalAssociation.objects.filter(industry__in=INDUSTRIES).values_list('industry', 'pk')
+        )
+        for industry in INDUSTRIES:
+            if industry not in associations:
+                associations[industry] = ProfessionalAssociation.objects.create(
+                    name=f'{industry} Association', description='', industry=industry,
+                ).pk
+        return [(pk, industry) for industry, pk in associations.items()]
+
+    def _skills(self):
+        Skill.objects.bulk_create(
+            [Skill(slug=name.lower(), name=name) for name in SKILLS], ignore_conflicts=True,
+        )
+        return list(Skill.objects.filter(slug__in=[name.lower() for name in SKILLS]).values_list('pk', 'name'))
+
+    def _events(self, count, associations, now, seed):
+        rng = random.Random(seed)
+        events = []
+        for i in range(count):
+            start = now + timedelta(days=rng.randint(-365, 365), hours=rng.randint(8, 18))
+            association_id, industry = rng.choice(associations)
+            virtual = rng.random() < 0.5
+            events.append(IndustryEvent(
+                association_id=association_id,
+                title=f'{industry} {rng.choice(["Summit", "Webinar", "Workshop", "Meetup"])} {i}',
+                description='',
+                event_type=rng.choice(['conference', 'webinar', 'workshop']),
+                start_date=start,
+                end_date=start + timedelta(hours=rng.choice([1, 2, 4, 8, 24])),
+                is_virtual=virtual,
+                location='' if virtual else rng.choice(['London', 'Berlin', 'New York', 'Lagos', 'Tokyo']),
+                price=Decimal(rng.choice([0, 0, 25, 99, 250])),
+            ))
+        IndustryEvent.objects.bulk_create(events, batch_size=BATCH_SIZE)
+        return count
+
+
+def _generate_chunk(task):
+    """INSERT statements with ready-to-bind rows for `count` users starting at offset `start`, in insert order"""
+    context, start, count = task
+    rng = random.Random(f'{context["seed"]}:{start}')
+    now = context['now']
+    rows = {model: [] for model in (User, UserProfile, UserMembership, Payment, ActivityLog, MemberDirectory, MemberSkill)}
+
+    for offset in range(start, start + count):
+        user_id = context['first_user'] + offset
+        membership_id = context['first_membership'] + offset
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        joined = now - timedelta(days=rng.random() * HISTORY_DAYS)
+        username = f'{USERNAME_PREFIX}{user_id}'
+        email = f'{username}@example.com'
+        plan_id, price = rng.choice(context['plans'])
+
+        rows[User].append(User(
+            id=user_id, username=username, email=email, password=context['password'],
+            first_name=first_name, last_name=last_name, date_joined=joined,
+        ))
+        rows[UserProfile].append(UserProfile(
+            user_id=user_id, email=email, fname=first_name, lname=last_name,
+            company=rng.choice(COMPANIES), created_at=joined, updated_at=joined,
+        ))
+        status = rng.choice(MEMBERSHIP_STATUSES)
+        rows[UserMembership].append(UserMembership(
+            id=membership_id, user_id=user_id, plan_id=plan_id, status=status,
+            current_period_start=now - timedelta(days=rng.randint(0, 29)) if status == 'active' else None,
+            created_at=joined, updated_at=joined,
+        ))
+
+        for n in range(_poisson(rng, context['payments'])):
+            paid = joined + (now - joined) * rng.random()
+            currency = rng.choice(CURRENCIES)
+            rows[Payment].append(Payment(
+                user_id=user_id, user_membership_id=membership_id, plan_id=plan_id, amount=Decimal(price),
+                currency=currency, stripe_payment_intent_id=f'pi_seed_{user_id}_{n}',
+                status=rng.choice(PAYMENT_STATUSES), description='Membership payment',
+                created_at=paid, updated_at=paid,
+            ))
+
+        for _ in range(_poisson(rng, context['activity'])):
+            rows[ActivityLog].append(ActivityLog(
+                user_id=user_id, action=rng.choice(ACTIONS), description='Synthetic activity',
+                ip_address=f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+                timestamp=joined + (now - joined) * rng.random(),
+            ))
+
+        if rng.random() < context['directory']:
+            # Sparse but unique: a user's directory id is offset like their user id
+            directory_id = context['first_directory'] + offset
+            association_id, _ = rng.choice(context['associations'])
+            member_skills = rng.sample(context['skills'], rng.randint(1, 4))
+            visible = rng.random() < 0.9
+            verification = 'verified' if rng.random() < 0.8 else 'pending'
+            rows[MemberDirectory].append(MemberDirectory(
+                id=directory_id, user_id=user_id, association_id=association_id,
+                job_title=rng.choice(TITLES), company=rng.choice(COMPANIES),
+                expertise=', '.join(name for _, name in member_skills),
+                is_public=visible, verification_status=verification,
+            ))
+            for position, (skill_id, _) in enumerate(member_skills):
+                rows[MemberSkill].append(MemberSkill(
+                    member_id=directory_id, skill_id=skill_id, position=position,
+                    is_visible=visible and verification == 'verified',
+                ))
+    return [_prepare(model, objects) for model, objects in rows.items() if objects]
+
+
+def _prepare(model, objects):
+    """The bulk_create work for a batch of instances: one INSERT and each row's values in database form.
+
+    Done in the worker, so the parent process only has to execute it.
+    Timestamps are taken as generated rather than stamped by auto_now(_add).
+    """
+    # Resolved once: every access through the `connection` proxy costs a thread-local lookup
+    db = connections[DEFAULT_DB_ALIAS]
+    pk = model._meta.pk
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field is pk and getattr(objects[0], field.attname) is None)
+    ]
+    quote = db.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    rows = [tuple(field.get_db_prep_save(getattr(obj, field.attname), db) for field in fields) for obj in objects]
+    return model.__name__, sql, rows
+
+
+def _reset_sequences():
+    """Point the id sequences past the explicitly inserted rows, so the next ORM insert does not reuse an id.
+
+    A no-op on SQLite, whose AUTOINCREMENT counter follows explicit ids; on
+    PostgreSQL the sequences are untouched by them.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), EXPLICIT_ID_MODELS)
+    if statements:
+        with transaction.atomic(), connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def _poisson(rng, mean):
+    """Small-mean Poisson sample (Knuth), so per-user counts vary around the average"""
+    if mean <= 0:
+        return 0
+    limit, k, p = pow(2.718281828459045, -mean), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+@contextmanager
+def _fast_inserts():
+    """On SQLite, skip the fsync per commit for the duration of the load"""
+    # The pragma cannot change inside a transaction, and there is nothing to fsync until it ends anyway
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        previous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA synchronous = {int(previous)}')
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from membership.lifecycle import sweep
+
+
+class Command(BaseCommand):
+    help = 'End cancelled memberships and lapse unrenewed ones whose billing period is over (run on a schedule)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Memberships per transaction (default MEMBERSHIP_SWEEP_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        changed = sweep(chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        for name, count in changed.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Swept {sum(changed.values())} membership(s) in {elapsed:.1f}s'))
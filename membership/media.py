@@ -0,0 +1,161 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+BLOCK_SIZE = 64 * 1024
+
+# A compressed file is served as what it is; Content-Encoding would make clients unpack it
+ENCODED_TYPES = {
+    'br': 'application/x-brotli',
+    'bzip2': 'application/x-bzip',
+    'compress': 'application/x-compress',
+    'gzip': 'application/gzip',
+    'xz': 'application/x-xz',
+}
+
+
+class _RangeFile:
+    """Read at most `length` bytes of an open file, starting at `offset`"""
+
+    def __init__(self, f, offset, length):
+        self.f = f
+        self.remaining = length
+        f.seek(offset)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.f.close()
+
+
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT with Range, conditional GET and proxy offload support.
+
+    With MEDIA_ACCEL set to 'x-accel-redirect' (nginx) or 'x-sendfile'
+    (Apache/lighttpd), only the headers are produced here and the proxy
+    sends the bytes.
+    """
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404('Not found')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (ValueError, OSError):
+        raise Http404('Not found')
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('Not found')
+
+    # Size and mtime only, so every server behind a load balancer agrees and a restored copy still matches
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    last_modified = http_date(st.st_mtime)
+    validators = {
+        'ETag': etag,
+        'Last-Modified': last_modified,
+        'Cache-Control': f'max-age={getattr(settings, "MEDIA_CACHE_MAX_AGE", 3600)}',
+    }
+
+    if not_modified(request, etag, st.st_mtime):
+        response = HttpResponseNotModified()
+        for header, value in validators.items():
+            response[header] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    if encoding:
+        content_type = ENCODED_TYPES.get(encoding, 'application/octet-stream')
+    content_type = content_type or 'application/octet-stream'
+
+    accel = getattr(settings, 'MEDIA_ACCEL', None)
+    if accel:
+        response = HttpResponse(content_type=content_type)
+        if accel == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + quote(path)
+        else:
+            response['X-Sendfile'] = full_path
+    else:
+        byte_range = _parse_range(request, etag, st.st_mtime, st.st_size)
+        if byte_range == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{st.st_size}'
+            return response
+
+        f = open(full_path, 'rb')
+        if byte_range:
+            start, end = byte_range
+            response = FileResponse(_RangeFile(f, start, end - start + 1), status=206, content_type=content_type)
+            response.block_size = BLOCK_SIZE
+            response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+            response['Content-Length'] = end - start + 1
+        else:
+            response = FileResponse(f, content_type=content_type)
+            response.block_size = BLOCK_SIZE
+
+    for header, value in validators.items():
+        response[header] = value
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def not_modified(request, etag, mtime):
+    """Whether the client's cached copy (If-None-Match / If-Modified-Since) is still current"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and int(mtime) <= since
+
+
+def _parse_range(request, etag, mtime, size):
+    """(start, end) for a single satisfiable byte range, None to send the whole file"""
+    header = request.META.get('HTTP_RANGE')
+    if not header or request.method not in ('GET', 'HEAD'):
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range:
+        # Only a strong match on the current representation may return a part of it
+        if if_range.startswith('"'):
+            if if_range != etag:
+                return None
+        else:
+            date = parse_http_date_safe(if_range)
+            if date is None or int(mtime) != date:
+                return None
+
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: fall back to a full response
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size:
+            return 'unsatisfiable'
+        if end < start:
+            return None
+    elif last:
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        start, end = max(size - length, 0), size - 1
+    else:
+        return None
+    return start, end
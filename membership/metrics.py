@@ -0,0 +1,313 @@
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the per-request query count histogram buckets
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# Stats for the request being handled in this thread/task, or None outside one
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+    """What one request cost, filled in by the hooks below while it runs"""
+
+    __slots__ = ('queries', 'sql_time', 'cache_hits', 'cache_misses', 'template_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and the time spent in them"""
+
+    def __init__(self, stats=None):
+        self.stats = stats or RequestStats()
+
+    @property
+    def count(self):
+        return self.stats.queries
+
+    @property
+    def elapsed(self):
+        return self.stats.sql_time
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.stats.sql_time += time.perf_counter() - started
+            self.stats.queries += 1
+
+
+class RequestMetricsMiddleware:
+    """Per-request query count, SQL time, cache hits/misses, template time and latency.
+
+    Reported back as a Server-Timing header, logged as one JSON line on the
+    `membership.metrics` logger and added to the rolling histograms served
+    at /metrics/. Goes first in MIDDLEWARE so the latency covers the stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        timer = QueryTimer(stats)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        route = (match.view_name if match else None) or 'unresolved'
+        response['Server-Timing'] = server_timing(stats, duration)
+        registry.observe(route, response.status_code, duration, stats)
+        logger.info(json.dumps({
+            'route': route,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': stats.queries,
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+            'template_ms': round(stats.template_time * 1000, 2),
+        }))
+        return response
+
+
+def server_timing(stats, duration):
+    return ', '.join([
+        f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries"',
+        f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+        f'tpl;dur={stats.template_time * 1000:.1f}',
+        f'total;dur={duration * 1000:.1f}',
+    ])
+
+
+class MetricsCacheMixin:
+    """Counts cache hits and misses against the current request"""
+
+    _in_get_many = False
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISS, version)
+        if not self._in_get_many:
+            _record_cache(value is not _MISS)
+        return default if value is _MISS else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        # Backends without their own get_many loop over get(); count each key once
+        self._in_get_many = True
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            self._in_get_many = False
+        stats = _current.get()
+        if stats is not None:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
+
+
+class MetricsLocMemCache(MetricsCacheMixin, LocMemCache):
+    pass
+
+
+class MetricsRedisCache(MetricsCacheMixin, RedisCache):
+    pass
+
+
+class MetricsDatabaseCache(MetricsCacheMixin, DatabaseCache):
+    pass
+
+
+class MetricsDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each top-level render against the current request"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.template_time += time.perf_counter() - started
+
+
+_MISS = object()
+
+
+def _record_cache(hit):
+    stats = _current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+class _Window:
+    """Totals for one route over one time slot"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.duration_sum = 0.0
+        self.duration_buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.query_sum = 0
+        self.query_buckets = [0] * (len(QUERY_BUCKETS) + 1)
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class RollingRegistry:
+    """Per-route histograms over the last METRICS_WINDOW seconds, kept as fixed time slots.
+
+    Each process keeps its own; scrape every worker, or aggregate downstream.
+    """
+
+    def __init__(self, window=None, slots=10):
+        self.window = window
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._data = {}  # slot number -> {route: _Window}
+
+    def observe(self, route, status, duration, stats):
+        slot = self._slot(time.time())
+        with self._lock:
+            windows = self._data.get(slot)
+            if windows is None:
+                windows = self._data[slot] = defaultdict(_Window)
+                self._expire(slot)
+            w = windows[route]
+            w.count += 1
+            w.errors += status >= 500
+            w.duration_sum += duration
+            w.duration_buckets[bisect.bisect_left(DURATION_BUCKETS, duration)] += 1
+            w.query_sum += stats.queries
+            w.query_buckets[bisect.bisect_left(QUERY_BUCKETS, stats.queries)] += 1
+            w.sql_time += stats.sql_time
+            w.template_time += stats.template_time
+            w.cache_hits += stats.cache_hits
+            w.cache_misses += stats.cache_misses
+
+    def snapshot(self):
+        """{route: _Window} summed over the live slots"""
+        now = self._slot(time.time())
+        totals = defaultdict(_Window)
+        with self._lock:
+            for slot, windows in self._data.items():
+                if slot <= now - self.slots:
+                    continue
+                for route, w in windows.items():
+                    total = totals[route]
+                    for name, value in vars(w).items():
+                        if isinstance(value, list):
+                            setattr(total, name, [a + b for a, b in zip(getattr(total, name), value)])
+                        else:
+                            setattr(total, name, getattr(total, name) + value)
+        return dict(totals)
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+    def _slot(self, now):
+        window = self.window or getattr(settings, 'METRICS_WINDOW', 300)
+        return int(now // (window / self.slots))
+
+    def _expire(self, current):
+        for slot in [slot for slot in self._data if slot <= current - self.slots]:
+            del self._data[slot]
+
+
+registry = RollingRegistry()
+
+
+def render_prometheus(snapshot=None):
+    """The rolling per-route metrics in the Prometheus text exposition format"""
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    lines = []
+
+    def histogram(name, help_text, bounds, buckets_attr, sum_attr, fmt=str):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for route, w in sorted(snapshot.items()):
+            label = _label(route)
+            cumulative = 0
+            for bound, count in zip(bounds, getattr(w, buckets_attr)):
+                cumulative += count
+                lines.append(f'{name}_bucket{{route="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{route="{label}",le="+Inf"}} {w.count}')
+            lines.append(f'{name}_sum{{route="{label}"}} {fmt(getattr(w, sum_attr))}')
+            lines.append(f'{name}_count{{route="{label}"}} {w.count}')
+
+    def gauge(name, help_text, value):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for route, w in sorted(snapshot.items()):
+            lines.append(f'{name}{{route="{_label(route)}"}} {value(w)}')
+
+    histogram('membership_request_duration_seconds', 'Request latency over the rolling window.',
+              DURATION_BUCKETS, 'duration_buckets', 'duration_sum', lambda v: f'{v:.6f}')
+    histogram('membership_request_queries', 'Database queries per request over the rolling window.',
+              QUERY_BUCKETS, 'query_buckets', 'query_sum')
+    gauge('membership_request_sql_seconds', 'Time spent in SQL over the rolling window.', lambda w: f'{w.sql_time:.6f}')
+    gauge('membership_request_template_seconds', 'Time spent rendering templates over the rolling window.',
+          lambda w: f'{w.template_time:.6f}')
+    gauge('membership_request_cache_hits', 'Cache hits over the rolling window.', lambda w: w.cache_hits)
+    gauge('membership_request_cache_misses', 'Cache misses over the rolling window.', lambda w: w.cache_misses)
+    gauge('membership_request_errors', 'Responses with a 5xx status over the rolling window.', lambda w: w.errors)
+    return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
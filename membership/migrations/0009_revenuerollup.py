@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-17 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0008_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('currency', models.CharField(choices=[('USD', 'USD ($)'), ('EUR', 'EUR (€)'), ('GBP', 'GBP (£)')], max_length=3)),
+                ('tier', models.CharField(blank=True, max_length=10)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payment_count', models.IntegerField(default=0)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refund_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day', 'currency', 'tier'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'currency', 'tier'), name='unique_revenue_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+TABLE = 'membership_member_search'
+
+
+def create_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other backends fall back to the ORM search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        "name, job_title, company, expertise, industry UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {TABLE}(rowid, name, job_title, company, expertise, industry) "
+        "SELECT d.id, TRIM(u.first_name || ' ' || u.last_name), d.job_title, d.company, d.expertise, a.industry "
+        "FROM membership_memberdirectory d "
+        "JOIN auth_user u ON u.id = d.user_id "
+        "JOIN membership_professionalassociation a ON a.id = d.association_id "
+        "WHERE d.is_public AND d.verification_status = 'verified'"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('membership', '0009_revenuerollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
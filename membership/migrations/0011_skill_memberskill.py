@@ -0,0 +1,84 @@
+# Generated by Django 5.2 on 2026-10-17 17:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def backfill_skills(apps, schema_editor):
+    MemberDirectory = apps.get_model('membership', 'MemberDirectory')
+    Skill = apps.get_model('membership', 'Skill')
+    MemberSkill = apps.get_model('membership', 'MemberSkill')
+
+    skills = {}
+    links = []
+    for member in MemberDirectory.objects.only('id', 'expertise', 'is_public', 'verification_status').iterator():
+        visible = member.is_public and member.verification_status == 'verified'
+        seen = set()
+        for part in (member.expertise or '').split(','):
+            name = ' '.join(part.split())[:100]
+            slug = slugify(name)[:100]
+            if not slug or slug in seen:
+                continue
+            seen.add(slug)
+            skill = skills.setdefault(slug, Skill(slug=slug, name=name))
+            skill.member_count += int(visible)
+            links.append((member.id, slug, len(seen) - 1, visible))
+
+    Skill.objects.bulk_create(skills.values(), batch_size=500)
+    ids = dict(Skill.objects.values_list('slug', 'id'))
+    MemberSkill.objects.bulk_create(
+        [MemberSkill(member_id=member_id, skill_id=ids[slug], position=position, is_visible=visible)
+         for member_id, slug, position, visible in links],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0010_member_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('member_count', models.PositiveIntegerField(default=0, help_text='Public, verified members with this skill')),
+            ],
+            options={
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['-member_count', 'name'], name='skill_member_count_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MemberSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('is_visible', models.BooleanField(default=False)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='membership.memberdirectory')),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='membership.skill')),
+            ],
+            options={
+                'ordering': ['member', 'position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='memberdirectory',
+            name='skills',
+            field=models.ManyToManyField(blank=True, related_name='members', through='membership.MemberSkill', to='membership.skill'),
+        ),
+        migrations.AddIndex(
+            model_name='memberskill',
+            index=models.Index(fields=['skill', 'is_visible'], name='memberskill_skill_visible_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='memberskill',
+            constraint=models.UniqueConstraint(fields=('member', 'skill'), name='unique_member_skill'),
+        ),
+        migrations.RunPython(backfill_skills, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-17 17:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0012_userprofile_picture_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', '-timestamp'], name='activitylog_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificationprogram',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='certification_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='industryevent',
+            index=models.Index(fields=['end_date', 'start_date'], name='event_end_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memberdirectory',
+            index=models.Index(condition=models.Q(('is_public', True), ('verification_status', 'verified')), fields=['id'], name='directory_visible_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membershipplan',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price'], name='plan_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', '-created_at'], name='payment_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usermembership',
+            index=models.Index(fields=['status'], name='usermembership_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['user_type'], name='userprofile_user_type_idx'),
+        ),
+    ]
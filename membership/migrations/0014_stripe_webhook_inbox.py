@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-17 17:55
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0013_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=100, unique=True)),
+                ('type', models.CharField(max_length=100)),
+                ('customer', models.CharField(blank=True, help_text='Stripe customer; events are applied in order per customer', max_length=100)),
+                ('created', models.DateTimeField(help_text='When Stripe created the event')),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('ignored', 'Ignored'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='usermembership',
+            name='stripe_synced_at',
+            field=models.DateTimeField(blank=True, help_text='Creation time of the last Stripe subscription event applied', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='usermembership',
+            index=models.Index(fields=['stripe_subscription_id'], name='usermembership_sub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usermembership',
+            index=models.Index(fields=['stripe_customer_id'], name='usermembership_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(fields=['status', 'customer', 'created'], name='webhookevent_pending_idx'),
+        ),
+    ]
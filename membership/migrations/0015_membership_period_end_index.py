@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0014_stripe_webhook_inbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usermembership',
+            index=models.Index(fields=['status', 'cancel_at_period_end', 'current_period_end'], name='usermembership_period_end_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2 on 2026-10-17 19:10
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+
+
+def intern_user_agents(apps, schema_editor):
+    ActivityLog = apps.get_model('membership', 'ActivityLog')
+    UserAgent = apps.get_model('membership', 'UserAgent')
+
+    ids = {}
+    last = 0
+    # Walk the table by primary key so each batch is one index range, however large the table
+    while True:
+        rows = list(
+            ActivityLog.objects.filter(pk__gt=last).order_by('pk').values_list('pk', 'user_agent_text')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last = rows[-1][0]
+        by_agent = {}
+        for pk, value in rows:
+            if value:
+                by_agent.setdefault(value, []).append(pk)
+        new = [value for value in by_agent if value not in ids]
+        if new:
+            UserAgent.objects.bulk_create(
+                [UserAgent(digest=hashlib.sha256(value.encode('utf-8')).hexdigest(), value=value) for value in new],
+                ignore_conflicts=True,
+            )
+            digests = {hashlib.sha256(value.encode('utf-8')).hexdigest(): value for value in new}
+            for pk, digest in UserAgent.objects.filter(digest__in=digests).values_list('pk', 'digest'):
+                ids[digests[digest]] = pk
+        # One UPDATE per distinct header in the batch, which is a handful
+        for value, pks in by_agent.items():
+            ActivityLog.objects.filter(pk__in=pks).update(user_agent=ids[value])
+
+
+def restore_user_agents(apps, schema_editor):
+    ActivityLog = apps.get_model('membership', 'ActivityLog')
+    UserAgent = apps.get_model('membership', 'UserAgent')
+    for pk, value in UserAgent.objects.values_list('pk', 'value'):
+        ActivityLog.objects.filter(user_agent=pk).update(user_agent_text=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0017_activitylog_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('value', models.TextField()),
+            ],
+        ),
+        migrations.RenameField(
+            model_name='activitylog',
+            old_name='user_agent',
+            new_name='user_agent_text',
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='user_agent',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='membership.useragent'),
+        ),
+        # The old column is dropped in 0020: on PostgreSQL the rows updated here leave deferred
+        # foreign key checks pending, and a table cannot be altered in the same transaction
+        migrations.RunPython(intern_user_agents, restore_user_agents),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 21:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0019_cache_table'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='activitylog',
+            name='user_agent_text',
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-17 19:19
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill(apps, schema_editor):
+    Payment = apps.get_model('membership', 'Payment')
+    RevenueRollup = apps.get_model('membership', 'RevenueRollup')
+    RevenueTotal = apps.get_model('membership', 'RevenueTotal')
+
+    # Existing refunds have no recorded moment; updated_at is what the rollups were bucketed by
+    Payment.objects.filter(status='refunded', refunded_at__isnull=True).update(refunded_at=F('updated_at'))
+    RevenueTotal.objects.bulk_create([
+        RevenueTotal(
+            currency=row['currency'],
+            gross_amount=row['gross'],
+            payment_count=row['payments'],
+            refunded_amount=row['refunded'],
+            refund_count=row['refunds'],
+        )
+        for row in RevenueRollup.objects.values('currency').annotate(
+            gross=Sum('gross_amount'), payments=Sum('payment_count'),
+            refunded=Sum('refunded_amount'), refunds=Sum('refund_count'),
+        )
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0020_remove_activitylog_user_agent_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('USD', 'USD ($)'), ('EUR', 'EUR (€)'), ('GBP', 'GBP (£)')], max_length=3, unique=True)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('payment_count', models.IntegerField(default=0)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('refund_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='refunded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 19:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0021_revenue_totals'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='usermembership',
+            name='usermembership_status_idx',
+        ),
+    ]
@@ -4,7 +4,7 @@ from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from PIL import Image
+from django.utils import timezone
 import uuid
 
 class MembershipPlan(models.Model):
@@ -28,11 +28,18 @@ class MembershipPlan(models.Model):
 
     class Meta:
         ordering = ['price']
+        indexes = [
+            # Plan listings: active plans by price
+            models.Index(fields=['price'], condition=models.Q(is_active=True), name='plan_active_price_idx'),
+        ]
 
     def __str__(self):
         return f"{self.tier.title()} - ${self.price}/month"
 
     def get_features_list(self):
+        # Plans served from the catalog cache carry a precomputed list
+        if hasattr(self, 'features_list'):
+            return self.features_list
         return self.features.split("\n")
 
 class UserMembership(models.Model):
@@ -52,11 +59,22 @@ class UserMembership(models.Model):
     current_period_start = models.DateTimeField(blank=True, null=True)
     current_period_end = models.DateTimeField(blank=True, null=True)
     cancel_at_period_end = models.BooleanField(default=False)
+    stripe_synced_at = models.DateTimeField(blank=True, null=True, help_text="Creation time of the last Stripe subscription event applied")
     created_at = models.DateTimeField(blank=True,null=True,auto_now_add=True)
     updated_at = models.DateTimeField(blank=True,null=True,auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Stripe webhooks find the membership by subscription, then by customer
+            models.Index(fields=['stripe_subscription_id'], name='usermembership_sub_idx'),
+            models.Index(fields=['stripe_customer_id'], name='usermembership_customer_idx'),
+            # The lifecycle sweeper's range scan over periods that ended (see membership/lifecycle.py);
+            # status leads, so it also serves plain status filters
+            models.Index(
+                fields=['status', 'cancel_at_period_end', 'current_period_end'], name='usermembership_period_end_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.plan.tier if self.plan else 'No Plan'}"
@@ -83,16 +101,24 @@ class Payment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,blank=True,null=True)
     user_membership = models.ForeignKey(UserMembership, on_delete=models.CASCADE, null=True, blank=True)
+    plan = models.ForeignKey(MembershipPlan, on_delete=models.SET_NULL, null=True, blank=True)
     amount = models.DecimalField(default=100,max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default='USD')
     stripe_payment_intent_id = models.CharField(default='pending_creation',max_length=100, unique=True)
+    idempotency_key = models.CharField(max_length=100, unique=True, blank=True, null=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     description = models.CharField(max_length=200, blank=True)
     created_at = models.DateTimeField(blank=True,null=True,auto_now_add=True)
     updated_at = models.DateTimeField(blank=True,null=True,auto_now=True)
+    # Set when the status becomes 'refunded'; the revenue rollup books the refund on this day
+    refunded_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Payment history and the dashboard's latest payments
+            models.Index(fields=['user', '-created_at'], name='payment_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Payment {self.stripe_payment_intent_id} - {self.amount} {self.currency}"
@@ -118,6 +144,8 @@ class UserProfile(models.Model):
         upload_to='profile_pictures/',
         default='profile_pictures/default.png'
     )
+    # Resized copies written by the image job: {size: {format: url}} (see membership/images.py)
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     email_verified = models.BooleanField(default=False)
     phone_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(blank=True,null=True,auto_now_add=True)
@@ -125,25 +153,13 @@ class UserProfile(models.Model):
 
     class Meta:
         ordering = ['user__username']
+        indexes = [
+            models.Index(fields=['user_type'], name='userprofile_user_type_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.user_type}"
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        # Resize profile picture if it exists
-        if self.profile_picture:
-            try:
-                img = Image.open(self.profile_picture.path)
-                if img.height > 300 or img.width > 300:
-                    output_size = (300, 300)
-                    img.thumbnail(output_size)
-                    img.save(self.profile_picture.path)
-            except:
-                # Handle cases where image might not exist or is corrupted
-                pass
-
     @property
     def full_name(self):
         return f"{self.user.first_name} {self.user.last_name}".strip()
@@ -175,6 +191,15 @@ class Member(models.Model):
     def __str__(self):
         return f"Member: {self.user_profile.user.username}"
 
+class UserAgent(models.Model):
+    """A distinct User-Agent header, stored once and referenced by ActivityLog"""
+    # sha256 of the header, so lookups use a fixed-width unique index however long the header is
+    digest = models.CharField(max_length=64, unique=True)
+    value = models.TextField()
+
+    def __str__(self):
+        return self.value
+
 class ActivityLog(models.Model):
     """Tracks user activities"""
     ACTION_CHOICES = [
@@ -190,11 +215,20 @@ class ActivityLog(models.Model):
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     description = models.TextField()
     ip_address = models.GenericIPAddressField(blank=True, null=True)
-    user_agent = models.TextField(blank=True, null=True)
+    # Never queried by user agent, so no index: it would only add to every insert
+    user_agent = models.ForeignKey(
+        UserAgent, on_delete=models.PROTECT, blank=True, null=True, related_name='+', db_index=False,
+    )
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # The dashboard's recent activity feed
+            models.Index(fields=['user', '-timestamp'], name='activitylog_user_time_idx'),
+            # Oldest rows first for archival (see membership/archive.py)
+            models.Index(fields=['timestamp'], name='activitylog_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.action} - {self.timestamp}"
@@ -219,6 +253,15 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Unread counts and the notification list (see membership/notifications.py)
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_unread_idx'),
+            # Only notifications that can expire, for purge_expired()
+            models.Index(
+                fields=['expires_at'], name='notification_expires_idx',
+                condition=models.Q(expires_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -257,6 +300,7 @@ class MemberDirectory(models.Model):
     job_title = models.CharField(max_length=100)
     company = models.CharField(max_length=100)
     expertise = models.CharField(max_length=200, help_text="Comma-separated skills/expertise")
+    skills = models.ManyToManyField('Skill', through='MemberSkill', related_name='members', blank=True)
     biography = models.TextField(blank=True)
     linkedin_url = models.URLField(blank=True)
     is_public = models.BooleanField(default=True)
@@ -264,6 +308,51 @@ class MemberDirectory(models.Model):
         ('pending', 'Pending'), ('verified', 'Verified'), ('rejected', 'Rejected')
     ], default='pending')
 
+    class Meta:
+        indexes = [
+            # Visible directory entries in keyset (pk) order
+            models.Index(
+                fields=['id'],
+                condition=models.Q(is_public=True, verification_status='verified'),
+                name='directory_visible_idx',
+            ),
+        ]
+
+class Skill(models.Model):
+    """Normalized expertise tag parsed from MemberDirectory.expertise (see membership/skills.py)"""
+    slug = models.SlugField(max_length=100, unique=True)
+    name = models.CharField(max_length=100)
+    member_count = models.PositiveIntegerField(default=0, help_text="Public, verified members with this skill")
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['-member_count', 'name'], name='skill_member_count_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class MemberSkill(models.Model):
+    """Links a directory entry to one of its skills, in the order they were listed"""
+    member = models.ForeignKey(MemberDirectory, on_delete=models.CASCADE)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE)
+    position = models.PositiveSmallIntegerField(default=0)
+    # Copy of the member's directory visibility, so facet counts never join MemberDirectory
+    is_visible = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['member', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['member', 'skill'], name='unique_member_skill'),
+        ]
+        indexes = [
+            models.Index(fields=['skill', 'is_visible'], name='memberskill_skill_visible_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.member_id}: {self.skill}"
+
 class IndustryEvent(models.Model):
     """Conference, webinar, workshop management"""
     association = models.ForeignKey(ProfessionalAssociation, on_delete=models.CASCADE)
@@ -280,6 +369,12 @@ class IndustryEvent(models.Model):
     max_attendees = models.IntegerField(default=100)
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
+    class Meta:
+        indexes = [
+            # Upcoming events: end_date >= now, by start_date
+            models.Index(fields=['end_date', 'start_date'], name='event_end_start_idx'),
+        ]
+
 class CertificationProgram(models.Model):
     """Professional certification programs"""
     association = models.ForeignKey(ProfessionalAssociation, on_delete=models.CASCADE)
@@ -288,4 +383,127 @@ class CertificationProgram(models.Model):
     requirements = models.TextField()
     exam_fee = models.DecimalField(max_digits=10, decimal_places=2)
     validity_period = models.IntegerField(help_text="Validity in months")  # 24 months for example
-    is_active = models.BooleanField(default=True)
\ No newline at end of file
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(is_active=True), name='certification_active_idx'),
+        ]
+
+
+class Job(models.Model):
+    """Background job queued for `manage.py run_jobs`"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=200, help_text="Dotted path to the handler function")
+    payload = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(max_length=100, unique=True, blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status})"
+
+
+class Counter(models.Model):
+    """Denormalized counts kept in sync by signals (see membership/counters.py)"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class RevenueRollup(models.Model):
+    """Daily revenue per currency and plan tier, maintained from Payment status changes"""
+    day = models.DateField()
+    currency = models.CharField(max_length=3, choices=Payment.CURRENCY_CHOICES)
+    tier = models.CharField(max_length=10, blank=True)
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payment_count = models.IntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refund_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', 'currency', 'tier']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'currency', 'tier'], name='unique_revenue_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.currency} {self.tier or '-'}: {self.net_amount}"
+
+    @property
+    def net_amount(self):
+        return self.gross_amount - self.refunded_amount
+
+
+class RevenueTotal(models.Model):
+    """All-time revenue per currency, moved together with RevenueRollup so the summary reads one row each"""
+    currency = models.CharField(max_length=3, choices=Payment.CURRENCY_CHOICES, unique=True)
+    gross_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    payment_count = models.IntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    refund_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.currency}: {self.net_amount}"
+
+    @property
+    def net_amount(self):
+        return self.gross_amount - self.refunded_amount
+
+
+class WebhookEvent(models.Model):
+    """Stripe webhook event stored on receipt and applied by `manage.py process_webhooks`"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=100, unique=True)
+    type = models.CharField(max_length=100)
+    customer = models.CharField(max_length=100, blank=True, help_text="Stripe customer; events are applied in order per customer")
+    created = models.DateTimeField(help_text="When Stripe created the event")
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(fields=['status', 'customer', 'created'], name='webhookevent_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} {self.type} ({self.status})"
@@ -0,0 +1,192 @@
+"""
+Notifications: segment fan-out in a background job, and cached unread counts.
+
+`fan_out(model, filters, ...)` queues one job for the users matched by
+ORM lookups on User or on a model with a user foreign key, e.g.
+fan_out(UserMembership, {'plan__tier': 'gold'}, ...). The segment is
+stored in the job payload as plain JSON (model label and lookups), so a
+queued job never runs code from the database and survives upgrades.
+The job walks the segment's user ids in keyset order and inserts one
+chunk of Notification rows per transaction, so it resumes where it left
+off when retried. Unread counts live in the cache and are incremented in
+place, so the navbar badge (the `unread_notifications` context variable)
+costs no query once warm.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .jobs import enqueue
+from .models import Notification
+
+TASK = 'membership.notifications.deliver'
+
+
+def unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def fan_out(model, filters, title, message, notification_type='info', link=None, expires_at=None,
+            user_field=None):
+    """Queue a notification for every user matching `filters`. Returns the job.
+
+    `model` is a model class or label and `filters` keyword lookups on it
+    with JSON values, e.g. {'plan__tier': 'gold'}. `user_field` names the
+    user foreign key when `model` is not the user model (default 'user').
+    The segment is evaluated by the job, so users who join it before the
+    job runs are included.
+    """
+    if isinstance(model, str):
+        model = apps.get_model(model)
+    # Bad lookups fail here rather than in the worker
+    model._default_manager.filter(**filters)
+    if user_field is None:
+        user_field = 'pk' if model is apps.get_model(settings.AUTH_USER_MODEL) else 'user'
+    if user_field != 'pk' and not user_field.endswith('_id'):
+        user_field = f'{user_field}_id'
+    return enqueue(TASK, {
+        'model': model._meta.label,
+        'filters': filters,
+        'user_field': user_field,
+        'title': title,
+        'message': message,
+        'notification_type': notification_type,
+        'link': link,
+        'expires_at': expires_at.isoformat() if expires_at else None,
+        'after': None,
+        'sent': 0,
+    })
+
+
+def deliver(payload, job=None):
+    """Job handler: insert the notifications for a fan_out() segment, chunk by chunk"""
+    model = apps.get_model(payload['model'])
+    segment = model._default_manager.filter(**payload['filters'])
+    field = payload['user_field']
+    user_ids = segment.order_by(field).values_list(field, flat=True).distinct()
+    expires_at = parse_datetime(payload['expires_at']) if payload['expires_at'] else None
+    chunk_size = getattr(settings, 'NOTIFICATION_CHUNK_SIZE', 2000)
+
+    while True:
+        remaining = user_ids if payload['after'] is None else user_ids.filter(**{f'{field}__gt': payload['after']})
+        chunk = [user_id for user_id in remaining[:chunk_size] if user_id is not None]
+        if not chunk:
+            break
+        with transaction.atomic():
+            Notification.objects.bulk_create(
+                [
+                    Notification(
+                        user_id=user_id,
+                        notification_type=payload['notification_type'],
+                        title=payload['title'],
+                        message=payload['message'],
+                        link=payload['link'],
+                        expires_at=expires_at,
+                    )
+                    for user_id in chunk
+                ],
+                batch_size=chunk_size,
+            )
+            bump_unread(chunk)
+            # Committed with the rows, so a retried job resumes after this chunk
+            payload['after'] = chunk[-1]
+            payload['sent'] += len(chunk)
+            if job is not None:
+                job.save(update_fields=['payload', 'updated_at'])
+
+
+def notify(user, title, message, notification_type='info', link=None, expires_at=None):
+    """Notify one user right away"""
+    notification = Notification.objects.create(
+        user=user, notification_type=notification_type, title=title, message=message,
+        link=link, expires_at=expires_at,
+    )
+    bump_unread([user.pk])
+    return notification
+
+
+def bump_unread(user_ids, delta=1):
+    """Adjust cached unread counts after notifications were added or read outside mark_read()"""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: _adjust(user_ids, delta))
+
+
+def unread_count(user):
+    """Unread, unexpired notifications for `user`, from the cache when possible"""
+    key = unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = unread(user).count()
+        # Bounds the drift from notifications expiring while cached
+        cache.set(key, count, getattr(settings, 'NOTIFICATION_UNREAD_TIMEOUT', 300))
+    return count
+
+
+def unread(user):
+    now = timezone.now()
+    return Notification.objects.filter(user=user, is_read=False).filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=now)
+    )
+
+
+def recent(user, limit=50):
+    """A user's newest unexpired notifications, read or not"""
+    now = timezone.now()
+    return list(
+        Notification.objects.filter(user=user).filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+        .order_by('-created_at')[:limit]
+    )
+
+
+def mark_read(user, ids=None):
+    """Mark some (or all) of a user's notifications read"""
+    notifications = unread(user)
+    if ids is not None:
+        notifications = notifications.filter(pk__in=ids)
+    updated = notifications.update(is_read=True)
+    if updated:
+        cache.delete(unread_key(user.pk))
+    return updated
+
+
+def purge_expired(now=None, chunk_size=None):
+    """Delete notifications whose expires_at has passed, one chunk per transaction. Returns the count."""
+    now = now or timezone.now()
+    chunk_size = chunk_size or getattr(settings, 'NOTIFICATION_CHUNK_SIZE', 2000)
+    purged = 0
+    while True:
+        with transaction.atomic():
+            # Served by the partial index on expires_at, which holds only rows that can expire
+            rows = list(
+                Notification.objects.filter(expires_at__lte=now).order_by('expires_at')
+                .values_list('pk', 'user_id')[:chunk_size]
+            )
+            if not rows:
+                break
+            Notification.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+            keys = {unread_key(user_id) for _, user_id in rows}
+            transaction.on_commit(lambda keys=keys: cache.delete_many(keys))
+        purged += len(rows)
+    return purged
+
+
+def context(request):
+    """Template context processor: `unread_notifications`, evaluated only if the template uses it"""
+    def count():
+        user = getattr(request, 'user', None)
+        return unread_count(user) if user is not None and user.is_authenticated else 0
+    return {'unread_notifications': count}
+
+
+def _adjust(user_ids, delta):
+    keys = [unread_key(user_id) for user_id in user_ids]
+    # Only counts already cached are adjusted; the rest are counted on their next read
+    for key in cache.get_many(keys):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            pass  # Expired in between
@@ -0,0 +1,237 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+SALT = 'membership.profiling'
+
+# Query parameter or header carrying a signed profiling token
+QUERY_FLAG = '_profile'
+HEADER = 'HTTP_X_PROFILE'
+
+# <timestamp>-<route>-<ms>ms.<prof|folded>
+NAME_RE = re.compile(r'^[\w.-]+\.(prof|folded)$')
+
+UNSAFE_RE = re.compile(r'[^\w-]+')
+
+
+def make_token(user):
+    """Signed token that lets this admin profile their own requests for PROFILE_TOKEN_MAX_AGE seconds"""
+    return signing.dumps(user.pk, salt=SALT)
+
+
+def _token_valid(request, token):
+    try:
+        user_id = signing.loads(token, salt=SALT, max_age=getattr(settings, 'PROFILE_TOKEN_MAX_AGE', 3600))
+    except signing.BadSignature:
+        return False
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and user.pk == user_id and _is_admin(user))
+
+
+def _is_admin(user):
+    profile = getattr(user, 'userprofile', None)
+    return user.is_superuser or (profile is not None and profile.user_type == 'admin')
+
+
+class ProfilingMiddleware:
+    """Opt-in request profiling, enabled by PROFILING_ENABLED.
+
+    An admin can cProfile a single request by sending a token from
+    make_token() as `?_profile=` or an `X-Profile` header. Independently,
+    every request is stack-sampled in the background and the samples are
+    kept for any request slower than PROFILE_SLOW_THRESHOLD seconds.
+    Profiles land in PROFILE_DIR, newest PROFILE_KEEP kept, and are listed
+    at /profiling/. Goes after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            return self.get_response(request)
+
+        token = request.GET.get(QUERY_FLAG) or request.META.get(HEADER)
+        if token and _token_valid(request, token):
+            return self._profile(request)
+
+        threshold = getattr(settings, 'PROFILE_SLOW_THRESHOLD', None)
+        if threshold is None:
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        sampler.start(thread_id)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop(thread_id)
+        duration = time.perf_counter() - started
+        if duration >= threshold and stacks:
+            save(_route(request), duration, 'folded', _folded(stacks))
+        return response
+
+    def _profile(self, request):
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - started
+        name = save(_route(request), duration, 'prof', _marshal(profiler))
+        response['X-Profile'] = name
+        return response
+
+
+class StackSampler:
+    """Background thread recording the call stack of every registered thread each PROFILE_SAMPLE_INTERVAL"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._active = {}  # thread id -> Counter of stacks
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._active[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+            time.sleep(getattr(settings, 'PROFILE_SAMPLE_INTERVAL', 0.005))
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own:
+                        stacks[_stack(frame)] += 1
+            del frames
+
+
+sampler = StackSampler()
+
+
+def save(route, duration, kind, data):
+    """Write a profile and drop the oldest beyond PROFILE_KEEP. Returns the file name."""
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+    name = f'{stamp}-{UNSAFE_RE.sub("_", route)}-{duration * 1000:.0f}ms.{kind}'
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    with open(os.path.join(directory, name), mode) as f:
+        f.write(data)
+    _rotate(directory)
+    return name
+
+
+def list_profiles():
+    """Saved profiles, newest first: [{'name', 'kind', 'size', 'created'}]"""
+    directory = profile_dir()
+    try:
+        names = [name for name in os.listdir(directory) if NAME_RE.match(name)]
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        st = os.stat(os.path.join(directory, name))
+        profiles.append({
+            'name': name,
+            'kind': 'cProfile' if name.endswith('.prof') else 'stack samples',
+            'size': st.st_size,
+            'created': datetime.fromtimestamp(st.st_mtime, tz=timezone.get_current_timezone()),
+        })
+    return sorted(profiles, key=lambda p: p['name'], reverse=True)
+
+
+def profile_path(name):
+    """Absolute path of a saved profile, or None if the name is not one"""
+    if not NAME_RE.match(name):
+        return None
+    path = os.path.join(profile_dir(), name)
+    return path if os.path.isfile(path) else None
+
+
+def summary(path, limit=40):
+    """Readable text of a profile: top functions by cumulative time, or the hottest sampled stacks"""
+    if path.endswith('.prof'):
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+    with open(path) as f:
+        rows = [line.rsplit(' ', 1) for line in f if line.strip()]
+    total = sum(int(count) for _, count in rows) or 1
+    rows.sort(key=lambda row: int(row[1]), reverse=True)
+    lines = [f'{total} samples']
+    for stack, count in rows[:limit]:
+        frames = stack.split(';')
+        lines.append(f'{int(count) / total:6.1%}  {" <- ".join(reversed(frames[-6:]))}')
+    return '\n'.join(lines)
+
+
+def profile_dir():
+    return str(getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+def _rotate(directory):
+    keep = getattr(settings, 'PROFILE_KEEP', 100)
+    names = sorted(name for name in os.listdir(directory) if NAME_RE.match(name))
+    for name in names[:-keep] if keep else names:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name if match else None) or 'unresolved'
+
+
+def _stack(frame):
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+def _folded(stacks):
+    # The collapsed-stack format read by flamegraph.pl and speedscope
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def _marshal(profiler):
+    # Profile.dump_stats() only writes to a path; this is the same marshalled format
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
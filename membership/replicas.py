@@ -0,0 +1,135 @@
+import contextvars
+import random
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Session key holding the time until which this session reads from the primary
+SESSION_KEY = '_primary_until'
+
+# Always read and written on the primary: the database cache (DatabaseCache's model), whose keys
+# must not lag behind invalidations
+PRIMARY_APPS = ('django_cache',)
+
+# Writes to these apps do not make a session sticky (the session row is saved on most requests,
+# and a cache miss fills the cache)
+UNTRACKED_APPS = ('sessions', 'django_cache')
+
+# Routing for the request being handled in this thread/task, or None outside one
+_current = contextvars.ContextVar('replica_routing', default=None)
+
+
+class _Routing:
+    __slots__ = ('replica', 'wrote', 'depth')
+
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+        # Transactions already open when the request started (ATOMIC_REQUESTS, tests)
+        self.depth = len(connections[DEFAULT_DB_ALIAS].atomic_blocks)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def replica_reads(view):
+    """Let this read-only view's ORM reads go to a replica (see ReplicaRoutingMiddleware)"""
+    view.replica_reads = True
+    return view
+
+
+class ReplicaRouter:
+    """Reads from a replica inside views marked @replica_reads, everything else on the primary.
+
+    A request reads from the primary again as soon as it writes or opens a
+    transaction, and ReplicaRoutingMiddleware keeps the session on the
+    primary for REPLICA_STICKY_SECONDS after that, so a redirect after a
+    POST always sees its own writes. With no DATABASE_REPLICAS it routes
+    nothing.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        if routing is None or not routing.replica or routing.wrote:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        if len(connections[DEFAULT_DB_ALIAS].atomic_blocks) > routing.depth:
+            return DEFAULT_DB_ALIAS
+        aliases = replica_aliases()
+        return random.choice(aliases) if aliases else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None and model._meta.app_label not in UNTRACKED_APPS:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Tracks writes per request for ReplicaRouter and makes the session sticky to the primary.
+
+    Goes after SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = _Routing()
+        token = _current.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        session = getattr(request, 'session', None)
+        # An empty session (anonymous, or just logged out) has nothing of its own to read back
+        if routing.wrote and session is not None and not session.is_empty():
+            session[SESSION_KEY] = time.time() + getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = _current.get()
+        if routing is None or not getattr(view_func, 'replica_reads', False):
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        session = getattr(request, 'session', None)
+        if session is not None and session.get(SESSION_KEY, 0) > time.time():
+            return None
+        routing.replica = True
+        return None
+
+
+def copy_sqlite(source, target):
+    """Copy the SQLite database at `source` over `target` with the online backup API.
+
+    A stand-in for streaming replication when running replicas locally;
+    readers of `target` see either the old or the new copy, never a mix.
+    Returns the seconds it took.
+    """
+    started = time.perf_counter()
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    return time.perf_counter() - started
@@ -0,0 +1,166 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .billing import CONVERSION_RATES
+from .models import MembershipPlan, Payment, RevenueRollup, RevenueTotal
+
+SETTLED_STATUSES = ('succeeded', 'refunded')
+
+ZERO = Decimal('0.00')
+
+
+def payment_state(payment, tier=None):
+    """Snapshot of the Payment fields that feed the rollup"""
+    if tier is None:
+        tier = _tier_for(payment)
+    return {
+        'status': payment.status,
+        'amount': payment.amount,
+        'currency': payment.currency,
+        'tier': tier,
+        'day': timezone.localdate(payment.created_at or timezone.now()),
+        'refund_day': timezone.localdate(payment.refunded_at or payment.updated_at or timezone.now()),
+    }
+
+
+def apply_change(old, new):
+    """Move a payment's contribution from its old state to its new one"""
+    for row in _contributions(old):
+        _add(*row, sign=-1)
+    for row in _contributions(new):
+        _add(*row, sign=1)
+
+
+def rebuild():
+    """Recompute every rollup and running total from the Payment table. Returns the number of rollup rows written."""
+    rows = {}
+
+    def bucket(day, currency, tier):
+        key = (day, currency, tier or '')
+        if key not in rows:
+            rows[key] = RevenueRollup(day=day, currency=currency, tier=tier or '')
+        return rows[key]
+
+    settled = (
+        Payment.objects.filter(status__in=SETTLED_STATUSES)
+        .annotate(rollup_day=TruncDate('created_at'))
+        .values('rollup_day', 'currency', 'plan__tier')
+        .annotate(total=Sum('amount'), n=Count('pk'))
+    )
+    for row in settled:
+        rollup = bucket(row['rollup_day'], row['currency'], row['plan__tier'])
+        rollup.gross_amount = row['total']
+        rollup.payment_count = row['n']
+
+    refunded = (
+        Payment.objects.filter(status='refunded')
+        .annotate(rollup_day=TruncDate(Coalesce('refunded_at', 'updated_at')))
+        .values('rollup_day', 'currency', 'plan__tier')
+        .annotate(total=Sum('amount'), n=Count('pk'))
+    )
+    for row in refunded:
+        rollup = bucket(row['rollup_day'], row['currency'], row['plan__tier'])
+        rollup.refunded_amount = row['total']
+        rollup.refund_count = row['n']
+
+    totals = {}
+    for rollup in rows.values():
+        total = totals.setdefault(rollup.currency, RevenueTotal(currency=rollup.currency))
+        total.gross_amount += rollup.gross_amount
+        total.payment_count += rollup.payment_count
+        total.refunded_amount += rollup.refunded_amount
+        total.refund_count += rollup.refund_count
+
+    with transaction.atomic():
+        RevenueRollup.objects.all().delete()
+        RevenueRollup.objects.bulk_create(rows.values(), batch_size=500)
+        RevenueTotal.objects.all().delete()
+        RevenueTotal.objects.bulk_create(totals.values())
+    return len(rows)
+
+
+def revenue_summary(days=30):
+    """Totals, per-currency breakdown and a daily trend for the admin dashboard; totals and trend are in USD"""
+    # One running-total row per currency, looked up through its unique index
+    currencies = [code for code, _ in Payment.CURRENCY_CHOICES]
+    by_currency = {
+        currency: gross - refunded
+        for currency, gross, refunded in RevenueTotal.objects.filter(currency__in=currencies).values_list(
+            'currency', 'gross_amount', 'refunded_amount'
+        )
+    }
+
+    # Each day's net in USD, converted per currency like the total
+    start = timezone.localdate() - timedelta(days=days - 1)
+    daily = {}
+    for row in RevenueRollup.objects.filter(day__gte=start).values('day', 'currency').annotate(
+        gross=Sum('gross_amount'), refunded=Sum('refunded_amount')
+    ):
+        daily[row['day']] = daily.get(row['day'], ZERO) + _to_usd(row['gross'] - row['refunded'], row['currency'])
+    trend = [(start + timedelta(days=i), daily.get(start + timedelta(days=i), ZERO).quantize(ZERO)) for i in range(days)]
+
+    total_usd = sum(
+        (_to_usd(amount, currency) for currency, amount in by_currency.items()), ZERO,
+    ).quantize(ZERO)
+    return {
+        'total_revenue': total_usd,
+        'revenue_by_currency': by_currency,
+        'revenue_trend': trend,
+    }
+
+
+def _to_usd(amount, currency):
+    return amount / Decimal(str(CONVERSION_RATES.get(currency, 1.0)))
+
+
+def _tier_for(payment):
+    if payment.plan_id is None:
+        return ''
+    if Payment.plan.is_cached(payment):
+        return payment.plan.tier
+    return MembershipPlan.objects.filter(pk=payment.plan_id).values_list('tier', flat=True).first() or ''
+
+
+def _contributions(state):
+    # Each row: (day, currency, tier, gross, payments, refunded, refunds)
+    if not state or state['status'] not in SETTLED_STATUSES:
+        return []
+    rows = [(state['day'], state['currency'], state['tier'], state['amount'], 1, ZERO, 0)]
+    if state['status'] == 'refunded':
+        rows.append((state['refund_day'], state['currency'], state['tier'], ZERO, 0, state['amount'], 1))
+    return rows
+
+
+def _add(day, currency, tier, gross, payments, refunded, refunds, sign):
+    amounts = (gross, payments, refunded, refunds)
+    _increment(RevenueRollup, {'day': day, 'currency': currency, 'tier': tier}, amounts, sign)
+    _increment(RevenueTotal, {'currency': currency}, amounts, sign)
+
+
+def _increment(model, lookup, amounts, sign):
+    gross, payments, refunded, refunds = amounts
+    changes = {
+        'gross_amount': F('gross_amount') + sign * gross,
+        'payment_count': F('payment_count') + sign * payments,
+        'refunded_amount': F('refunded_amount') + sign * refunded,
+        'refund_count': F('refund_count') + sign * refunds,
+    }
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(
+                gross_amount=sign * gross,
+                payment_count=sign * payments,
+                refunded_amount=sign * refunded,
+                refund_count=sign * refunds,
+                **lookup
+            )
+    except IntegrityError:
+        # Created concurrently, fall back to the in-place update
+        model.objects.filter(**lookup).update(**changes)
@@ -0,0 +1,180 @@
+import re
+
+from django.conf import settings
+from django.db import connection, connections, router, transaction
+from django.db.models import Prefetch, Q
+
+from .models import MemberDirectory, MemberSkill
+
+# SQLite FTS5 table created by migration 0010, rowid = MemberDirectory.id
+TABLE = 'membership_member_search'
+
+SEARCH_COLUMNS = '{name job_title company expertise}'
+
+# Columns rendered by a directory card (member_directory_page.html)
+CARD_FIELDS = (
+    'job_title', 'company', 'linkedin_url',
+    'user__first_name', 'user__last_name', 'user__email',
+    'user__userprofile__profile_picture', 'user__userprofile__picture_variants', 'association__name',
+)
+
+INDEXED_FIELDS = ('pk', 'user__first_name', 'user__last_name', 'job_title', 'company', 'expertise', 'association__industry')
+
+
+def available():
+    """The full-text index only exists on SQLite; other backends use the ORM scan"""
+    return connection.vendor == 'sqlite'
+
+
+def visible_members():
+    """Directory entries that are shown to other members"""
+    return MemberDirectory.objects.filter(is_public=True, verification_status='verified')
+
+
+def search(query, industry=None, limit=None, after=None, skill=None):
+    """Return MemberDirectory ids matching `query`, best match first.
+
+    Every word is prefix-matched ("pyth dev" finds "Python Developer"),
+    and `skill` keeps members tagged with that skill slug. Results are ordered by (rank, id) and `after` continues from the id a
+    previous call ended on, so callers page through every match rather
+    than a capped list. Without a `limit`, at most MEMBER_SEARCH_LIMIT ids
+    are returned. Returns None when the index is not available so callers
+    can fall back to `orm_search`.
+    """
+    if not available():
+        return None
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return []
+
+    match = SEARCH_COLUMNS + ' : (' + ' '.join(f'"{term}"*' for term in terms) + ')'
+    hits = f'SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH %s'
+    params = [match]
+    if industry:
+        hits += ' AND industry = %s'
+        params.append(industry)
+    if skill:
+        # Filtered inside the ranked query, so a page is never emptied after the LIMIT
+        hits += (
+            ' AND rowid IN (SELECT link.member_id FROM membership_memberskill AS link'
+            ' INNER JOIN membership_skill AS skill ON skill.id = link.skill_id WHERE skill.slug = %s)'
+        )
+        params.append(skill)
+    if after is None:
+        sql = f'SELECT rowid FROM ({hits}) AS hits ORDER BY rank, rowid LIMIT %s'
+    else:
+        # Keyset on (rank, rowid), with the cursor's rank taken from the same query; a cursor
+        # that no longer matches ends the listing
+        sql = (
+            f'WITH hits AS ({hits}), position AS (SELECT rank FROM hits WHERE rowid = %s) '
+            'SELECT hits.rowid FROM hits, position '
+            'WHERE hits.rank > position.rank OR (hits.rank = position.rank AND hits.rowid > %s) '
+            'ORDER BY hits.rank, hits.rowid LIMIT %s'
+        )
+        params += [after, after]
+    params.append(limit or getattr(settings, 'MEMBER_SEARCH_LIMIT', 200))
+
+    # The index is replicated with its table, so it follows the router like the ORM reads
+    with connections[router.db_for_read(MemberDirectory)].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def orm_search(query, industry=None, skill=None):
+    """The unindexed LIKE scan, used where FTS5 is unavailable and as the benchmark baseline"""
+    members = visible_members()
+    if skill:
+        members = members.filter(memberskill__skill__slug=skill)
+    if query:
+        members = members.filter(
+            Q(user__first_name__icontains=query) |
+            Q(user__last_name__icontains=query) |
+            Q(job_title__icontains=query) |
+            Q(company__icontains=query) |
+            Q(expertise__icontains=query)
+        )
+    if industry:
+        members = members.filter(association__industry=industry)
+    return members
+
+
+def directory_page(query='', industry=None, after=None, size=None, skill=None):
+    """One page of directory cards and the cursor for the next page (None on the last one).
+
+    Unsearched listings page by primary key (`pk > after`); search results
+    page by rank through the full-text index itself. Either way a page is
+    one card query plus one for the card's skill badges.
+    """
+    size = size or getattr(settings, 'DIRECTORY_PAGE_SIZE', 24)
+    ranked_ids = search(query, industry, limit=size + 1, after=after, skill=skill) if query else None
+
+    if ranked_ids is not None:
+        page_ids = ranked_ids[:size]
+        by_id = _cards(visible_members()).in_bulk(page_ids)
+        members = [by_id[pk] for pk in page_ids if pk in by_id]
+        # From the ranked ids, so a card dropped between index and table cannot end the listing
+        next_cursor = page_ids[-1] if len(ranked_ids) > size else None
+    else:
+        cards = _cards(orm_search(query, industry, skill)).order_by('pk')
+        if after is not None:
+            cards = cards.filter(pk__gt=after)
+        members = list(cards[:size + 1])
+        next_cursor = members[size - 1].pk if len(members) > size else None
+        members = members[:size]
+    return members, next_cursor
+
+
+def index_members(ids):
+    """Refresh the given directory entries, dropping any that are no longer visible"""
+    ids = list(ids)
+    if not ids or not available():
+        return
+    rows = visible_members().filter(pk__in=ids).values_list(*INDEXED_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(pk,) for pk in ids])
+        cursor.executemany(_INSERT, [_index_row(row) for row in rows])
+
+
+def remove_member(member_id):
+    if available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [member_id])
+
+
+def rebuild(batch_size=1000):
+    """Repopulate the index from MemberDirectory. Returns the number of rows indexed."""
+    if not available():
+        return 0
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        batch = []
+        for row in visible_members().values_list(*INDEXED_FIELDS).iterator(chunk_size=batch_size):
+            batch.append(_index_row(row))
+            if len(batch) >= batch_size:
+                cursor.executemany(_INSERT, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(_INSERT, batch)
+            count += len(batch)
+        # Merge the b-tree segments left behind by the bulk load
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+    return count
+
+
+_INSERT = f'INSERT INTO {TABLE}(rowid, name, job_title, company, expertise, industry) VALUES (%s, %s, %s, %s, %s, %s)'
+
+
+def _cards(members):
+    skill_links = MemberSkill.objects.select_related('skill').order_by('position')
+    return (
+        members.select_related('user', 'user__userprofile', 'association')
+        .only(*CARD_FIELDS)
+        .prefetch_related(Prefetch('memberskill_set', queryset=skill_links, to_attr='skill_links'))
+    )
+
+
+def _index_row(row):
+    pk, first_name, last_name, job_title, company, expertise, industry = row
+    return (pk, f'{first_name} {last_name}'.strip(), job_title, company, expertise, industry)
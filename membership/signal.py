@@ -43,4 +43,225 @@
 #         )
 
 # # Run this when the app is ready                                                                                                                                     
-# # create_default_settings()                  
\ No newline at end of file
+# # create_default_settings()                  
+
+# ========================================================
+# Denormalized counters (see membership/counters.py)
+# ========================================================
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+
+from . import counters
+from .models import UserMembership, UserProfile
+
+# model -> (field, value that is counted, counter name)
+COUNTED_FIELDS = {
+    UserProfile: ('user_type', 'member', 'total_members'),
+    UserMembership: ('status', 'active', 'active_members'),
+}
+
+_DEFERRED = object()
+
+
+def remember_counted_state(sender, instance, **kwargs):
+    """Remember the value as loaded from the database so saves can compute a delta"""
+    field = COUNTED_FIELDS[sender][0]
+    if instance.pk is None:
+        instance._counted_state = None
+    else:
+        # Don't trigger a query for fields deferred with .only()/.defer()
+        instance._counted_state = instance.__dict__.get(field, _DEFERRED)
+
+
+def load_deferred_counted_state(sender, instance, **kwargs):
+    field = COUNTED_FIELDS[sender][0]
+    if getattr(instance, '_counted_state', None) is _DEFERRED:
+        instance._counted_state = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+def update_counter_on_save(sender, instance, created, **kwargs):
+    field, counted_value, name = COUNTED_FIELDS[sender]
+    old = None if created else getattr(instance, '_counted_state', None)
+    new = getattr(instance, field)
+    counters.increment(name, int(new == counted_value) - int(old == counted_value))
+    instance._counted_state = new
+
+
+def update_counter_on_delete(sender, instance, **kwargs):
+    field, counted_value, name = COUNTED_FIELDS[sender]
+    state = getattr(instance, '_counted_state', None)
+    if state is _DEFERRED:
+        state = instance.__dict__.get(field)
+    if state == counted_value:
+        counters.increment(name, -1)
+
+
+for model in COUNTED_FIELDS:
+    post_init.connect(remember_counted_state, sender=model, dispatch_uid=f'counters_init_{model.__name__}')
+    pre_save.connect(load_deferred_counted_state, sender=model, dispatch_uid=f'counters_pre_save_{model.__name__}')
+    post_save.connect(update_counter_on_save, sender=model, dispatch_uid=f'counters_save_{model.__name__}')
+    post_delete.connect(update_counter_on_delete, sender=model, dispatch_uid=f'counters_delete_{model.__name__}')
+
+
+# ========================================================
+# Revenue rollup (see membership/revenue.py)
+# ========================================================
+
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import revenue
+from .models import Payment
+
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_revenue_state(sender, instance, **kwargs):
+    """Stamp the refund moment and load the stored payment so post_save can move its rollup contribution"""
+    if instance.status == 'refunded':
+        if instance.refunded_at is None:
+            instance.refunded_at = timezone.now()
+    else:
+        instance.refunded_at = None
+    instance._revenue_state = None
+    if not instance._state.adding:
+        old = Payment.objects.select_related('plan').filter(pk=instance.pk).first()
+        if old is not None:
+            instance._revenue_state = revenue.payment_state(old)
+
+
+@receiver(post_save, sender=Payment)
+def update_revenue_rollup(sender, instance, created, **kwargs):
+    old = getattr(instance, '_revenue_state', None)
+    if (old is None or old['status'] not in revenue.SETTLED_STATUSES) and instance.status not in revenue.SETTLED_STATUSES:
+        return
+    revenue.apply_change(old, revenue.payment_state(instance))
+
+
+@receiver(pre_delete, sender=Payment)
+def remove_payment_revenue(sender, instance, **kwargs):
+    if instance.status in revenue.SETTLED_STATUSES:
+        revenue.apply_change(revenue.payment_state(instance), None)
+
+
+# ========================================================
+# Plan catalog cache (see membership/catalog.py)
+# ========================================================
+
+from . import catalog
+from .models import MembershipPlan
+
+
+@receiver(post_save, sender=MembershipPlan)
+@receiver(post_delete, sender=MembershipPlan)
+def invalidate_plan_catalog(sender, **kwargs):
+    catalog.invalidate()
+
+
+# ========================================================
+# Member directory search index (see membership/search.py)
+# ========================================================
+
+from django.contrib.auth.models import User
+
+from . import search
+from .models import MemberDirectory, ProfessionalAssociation
+
+
+@receiver(post_save, sender=MemberDirectory)
+def index_directory_entry(sender, instance, **kwargs):
+    search.index_members([instance.pk])
+
+
+@receiver(post_delete, sender=MemberDirectory)
+def unindex_directory_entry(sender, instance, **kwargs):
+    search.remove_member(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def reindex_directory_names(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save last_login only; skip the lookup unless a searched field can have changed
+    if created or (update_fields is not None and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    search.index_members(MemberDirectory.objects.filter(user=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=ProfessionalAssociation)
+def reindex_association_members(sender, instance, created, **kwargs):
+    if not created:
+        search.index_members(MemberDirectory.objects.filter(association=instance).values_list('pk', flat=True))
+
+
+# ========================================================
+# Directory skills (see membership/skills.py)
+# ========================================================
+
+from . import skills
+
+
+@receiver(post_save, sender=MemberDirectory)
+def sync_directory_skills(sender, instance, **kwargs):
+    skills.sync(instance)
+
+
+@receiver(pre_delete, sender=MemberDirectory)
+def remove_directory_skills(sender, instance, **kwargs):
+    skills.remove(instance)
+
+
+# ========================================================
+# Profile picture thumbnails (see membership/images.py)
+# ========================================================
+
+from . import images
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_profile_picture(sender, instance, **kwargs):
+    # Deferred by .only()/.defer(): leave it unknown rather than querying
+    stored = instance.__dict__.get('profile_picture', _DEFERRED)
+    instance._stored_picture = None if instance.pk is None else getattr(stored, 'name', stored)
+
+
+@receiver(pre_save, sender=UserProfile)
+def detect_profile_picture_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        instance._picture_changed = False
+        return
+    if 'profile_picture' not in instance.__dict__:
+        # Still deferred, so it was never touched
+        instance._picture_changed = False
+        return
+    picture = instance.profile_picture
+    instance._picture_changed = not picture._committed or picture.name != instance._stored_picture
+    if instance._picture_changed:
+        # Stop serving the old thumbnails until the new ones are written; the default's are shared
+        instance.picture_variants = images.default_variants() if images.is_default(picture.name) else {}
+
+
+@receiver(post_save, sender=UserProfile)
+def queue_profile_picture_variants(sender, instance, **kwargs):
+    if getattr(instance, '_picture_changed', False) and instance.profile_picture:
+        # Profiles on the default share its variants instead of each resizing it
+        if not images.is_default(instance.profile_picture.name):
+            images.queue_profile_picture(instance)
+    if 'profile_picture' in instance.__dict__:
+        instance._stored_picture = instance.profile_picture.name
+
+
+# ========================================================
+# Per-user dashboard cache (see membership/dashboard.py)
+# ========================================================
+
+from . import dashboard
+from .models import ActivityLog
+
+
+def invalidate_user_dashboard(sender, instance, **kwargs):
+    if instance.user_id is not None:
+        dashboard.invalidate(instance.user_id)
+
+
+for model in (Payment, ActivityLog, UserMembership, UserProfile):
+    post_save.connect(invalidate_user_dashboard, sender=model, dispatch_uid=f'dashboard_save_{model.__name__}')
+    post_delete.connect(invalidate_user_dashboard, sender=model, dispatch_uid=f'dashboard_delete_{model.__name__}')
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.text import slugify
+
+from .models import MemberSkill, Skill
+
+
+def parse_expertise(text):
+    """Split a comma-separated expertise string into unique (slug, name) pairs, in listed order"""
+    skills = {}
+    for part in (text or '').split(','):
+        name = ' '.join(part.split())[:100]
+        slug = slugify(name)[:100]
+        if slug and slug not in skills:
+            skills[slug] = name
+    return list(skills.items())
+
+
+def is_visible(member):
+    return member.is_public and member.verification_status == 'verified'
+
+
+def sync(member):
+    """Point a directory entry's skill links at its current expertise and move the facet counts"""
+    parsed = parse_expertise(member.expertise)
+    visible = is_visible(member)
+    with transaction.atomic():
+        ids = _skill_ids(parsed)
+        wanted = [(ids[slug], visible) for slug, _ in parsed]
+        current = list(MemberSkill.objects.filter(member=member).order_by('position').values_list('skill_id', 'is_visible'))
+        if current == wanted:
+            return
+
+        MemberSkill.objects.filter(member=member).delete()
+        MemberSkill.objects.bulk_create([
+            MemberSkill(member=member, skill_id=skill_id, position=position, is_visible=visible)
+            for position, (skill_id, _) in enumerate(wanted)
+        ])
+        old_visible = {skill_id for skill_id, was_visible in current if was_visible}
+        new_visible = {skill_id for skill_id, _ in wanted} if visible else set()
+        _adjust(old_visible - new_visible, -1)
+        _adjust(new_visible - old_visible, 1)
+
+
+def remove(member):
+    """Take a directory entry that is about to be deleted out of the facet counts"""
+    _adjust(MemberSkill.objects.filter(member=member, is_visible=True).values_list('skill_id', flat=True), -1)
+
+
+def facets(limit=50):
+    """Skills with the most public, verified members: [{'slug', 'name', 'count'}]"""
+    return [
+        {'slug': slug, 'name': name, 'count': count}
+        for slug, name, count in Skill.objects.filter(member_count__gt=0)
+        .order_by('-member_count', 'name')
+        .values_list('slug', 'name', 'member_count')[:limit]
+    ]
+
+
+def recount():
+    """Recompute Skill.member_count from the link table. Returns the number of skills corrected."""
+    visible_links = (
+        MemberSkill.objects.filter(skill=OuterRef('pk'), is_visible=True)
+        .values('skill').annotate(n=Count('pk')).values('n')
+    )
+    with transaction.atomic():
+        actual = Coalesce(Subquery(visible_links), 0)
+        drifted = Skill.objects.annotate(actual=actual).exclude(member_count=F('actual'))
+        return Skill.objects.filter(pk__in=drifted.values('pk')).update(member_count=actual)
+
+
+def _skill_ids(parsed):
+    if not parsed:
+        return {}
+    slugs = [slug for slug, _ in parsed]
+    ids = dict(Skill.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+    missing = [Skill(slug=slug, name=name) for slug, name in parsed if slug not in ids]
+    if missing:
+        # Another writer may create the same skill concurrently
+        Skill.objects.bulk_create(missing, ignore_conflicts=True)
+        ids = dict(Skill.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+    return ids
+
+
+def _adjust(skill_ids, delta):
+    skill_ids = list(skill_ids)
+    if skill_ids:
+        Skill.objects.filter(pk__in=skill_ids).update(member_count=F('member_count') + delta)
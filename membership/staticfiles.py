@@ -0,0 +1,130 @@
+import gzip
+import logging
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+
+from .media import not_modified
+
+try:
+    import brotli
+except ImportError:  # pinned in requirements.txt; without it only .gz sidecars are written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico')
+
+# Sidecar suffix -> Content-Encoding, in order of preference
+ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+# name.<12 hex chars>.ext as written by ManifestStaticFilesStorage
+HASHED_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Content-hashed static files with .gz (and .br, if brotli is installed) sidecars"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        written = 0
+        names = set(paths) | {self.hashed_files.get(self.hash_key(self.clean_name(name)), name) for name in paths}
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE) and self.exists(name):
+                written += self._compress(name)
+        logger.info('Wrote %s precompressed static file(s)', written)
+
+    def _compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data, quality=11)))
+
+        written = 0
+        for suffix, compressed in variants:
+            path = self.path(name + suffix)
+            if len(compressed) >= len(data):
+                # Not worth a sidecar; drop any stale one
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            with open(path, 'wb') as out:
+                out.write(compressed)
+            written += 1
+        return written
+
+
+class StaticFilesMiddleware:
+    """Serve collected files from STATIC_ROOT ahead of the views.
+
+    Picks the best precompressed sidecar allowed by Accept-Encoding and
+    marks content-hashed names as immutable for a year. Anything not in
+    STATIC_ROOT falls through to the rest of the stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix) and settings.STATIC_ROOT:
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        served, encoding = path, None
+        accepted = _accepted_encodings(request)
+        for suffix, candidate in ENCODINGS:
+            if candidate in accepted and os.path.isfile(path + suffix):
+                served, encoding = path + suffix, candidate
+                break
+
+        st = os.stat(path)
+        # Each encoding is a different representation, so it gets its own strong ETag
+        etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}{"-" + encoding if encoding else ""}"'
+        cache_control = IMMUTABLE if HASHED_RE.search(name) else f'public, max-age={getattr(settings, "STATIC_CACHE_MAX_AGE", 60)}'
+
+        if not_modified(request, etag, st.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            response = FileResponse(open(served, 'rb'), content_type=content_type, filename=os.path.basename(path))
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = http_date(st.st_mtime)
+
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def _accepted_encodings(request):
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
@@ -0,0 +1,112 @@
+import errno
+import hashlib
+import os
+import shutil
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+BLOB_DIR = '.blobs'
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DedupStorage(FileSystemStorage):
+    """FileSystemStorage that keeps a single copy of each distinct file.
+
+    Content is written once to `<MEDIA_ROOT>/.blobs/<sha256>`, and every name
+    handed out is a hard link to its blob. The blob's link count is the
+    reference count: re-uploading bytes that are already stored only adds a
+    link, and deleting the last name removes the blob. Names still resolve
+    to ordinary files, so path(), url() and static serving are unchanged.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # The same bytes uploaded again under the same name cost nothing
+        if self.exists(name):
+            blob = self._blob_path(file_digest(content))
+            if os.path.exists(blob) and os.path.samefile(self.path(name), blob):
+                return name
+        return super().save(name, content, max_length=max_length)
+
+    def _save(self, name, content):
+        blob = self._blob_path(file_digest(content))
+        if not os.path.exists(blob):
+            blob_name = os.path.relpath(blob, self.location)
+            stored = super()._save(blob_name, content)
+            if stored != blob_name:
+                # Another upload wrote the same blob first
+                os.remove(self.path(stored))
+
+        while True:
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                link_or_copy(blob, path)
+            except FileExistsError:
+                name = self.get_available_name(name)
+                continue
+            return name.replace('\\', '/')
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        path = self.path(name)
+        try:
+            links = os.stat(path).st_nlink
+        except FileNotFoundError:
+            return
+        blob = self._blob_path(path_digest(path)) if links == 2 else None
+        os.remove(path)
+        # Only the blob itself is left, so nothing references it any more
+        if blob and os.path.exists(blob) and os.stat(blob).st_nlink == 1:
+            os.remove(blob)
+
+    def references(self, name):
+        """How many stored names share this file's content"""
+        return max(os.stat(self.path(name)).st_nlink - 1, 1)
+
+    def listdir(self, path):
+        directories, files = super().listdir(path)
+        if os.path.normpath(path) in ('', '.'):
+            directories = [d for d in directories if d != BLOB_DIR]
+        return directories, files
+
+    def _blob_path(self, digest):
+        return os.path.join(self.location, BLOB_DIR, digest[:2], digest)
+
+
+def file_digest(content):
+    """SHA-256 of a Django File, leaving it rewound"""
+    sha = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        sha.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return sha.hexdigest()
+
+
+def path_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def link_or_copy(source, target):
+    """Hard link `target` to `source`, copying where links are not supported"""
+    try:
+        os.link(source, target)
+    except OSError as e:
+        if isinstance(e, FileExistsError) or e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        with os.fdopen(fd, 'wb') as out, open(source, 'rb') as src:
+            shutil.copyfileobj(src, out, CHUNK_SIZE)
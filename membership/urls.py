@@ -1,6 +1,4 @@
 from django.urls import path
-from django.conf import settings
-from django.conf.urls.static import static
 from . import views
 from django.contrib.auth import views as auth_views
 
@@ -31,20 +29,24 @@ urlpatterns = [
     path('payment/success/', views.payment_success, name='payment_success'),
     path('payment/history/', views.payment_history, name='payment_history'),
     path('membership/cancel/', views.cancel_membership, name='cancel_membership'),
+    path('notifications/', views.notification_list, name='notifications'),
+    path('stripe/webhook/', views.stripe_webhook, name='stripe_webhook'),
     
     # Admin URLs (Protected)
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),     
+    path('metrics/', views.metrics, name='metrics'),
+    path('profiling/', views.request_profiles, name='request_profiles'),
+    path('profiling/<str:name>/', views.request_profile_download, name='request_profile_download'),
         # Association features
     path('directory/', views.member_directory, name='member_directory'),
+    path('directory/skills/', views.skill_facets, name='skill_facets'),
     path('events/', views.industry_events, name='industry_events'),
     path('events/<int:event_id>/register/', views.event_registration, name='event_registration'),
     path('certifications/', views.certification_programs, name='certification_programs'),
     # path('profile/professional/', views.professional_profile, name='professional_profile'),                                           
 ]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media files are served by core/urls.py (membership/media.py)
 
 # Error handlers
 handler404 = 'membership.views.handler404'
@@ -1,19 +1,20 @@
-from datetime import timezone
+from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.conf import settings
 from django.urls import reverse
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
-from django.db.models import Q
 from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 import stripe
 import random
-from decimal import Decimal
 import uuid
 from datetime import datetime
 from .forms import (
@@ -21,9 +22,18 @@ from .forms import (
     PaymentForm, ContactForm, PasswordResetForm, ConfirmCodeForm, NewPasswordForm
 )
 from .models import (
-    CertificationProgram, IndustryEvent, MemberDirectory, MembershipPlan, UserMembership, Payment, UserProfile,
-    ActivityLog, Notification, SystemSetting, User
+    CertificationProgram, IndustryEvent, MembershipPlan, UserMembership, Payment, UserProfile,
+    Notification, SystemSetting, User
 )
+from .activity import log_activity
+from .billing import start_charge
+from .catalog import active_plans, get_plan
+from .counters import get_counts
+from .dashboard import get_dashboard
+from .metrics import render_prometheus
+from .replicas import replica_reads
+from .revenue import revenue_summary
+from . import notifications, profiling, search, skills, webhooks
 
 # Stripe API Key
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -57,23 +67,13 @@ def is_admin(user):
 def is_staff(user):
     return user.is_authenticated and (user.is_staff or (hasattr(user, 'userprofile') and user.userprofile.user_type == 'staff'))
 
-def log_activity(user, action, description, ip_address=None, user_agent=None):
-    """Helper function to log user activities"""
-    ActivityLog.objects.create(
-        user=user,
-        action=action,
-        description=description,
-        ip_address=ip_address,
-        user_agent=user_agent
-    )
-
 # ========================================================
 # Public Views (No Login Required)
 # ========================================================
 
 def homepage(request):
     """Homepage with featured membership plans"""
-    featured_plans = MembershipPlan.objects.filter(is_active=True).order_by('price')[:3]
+    featured_plans = active_plans()[:3]
     
     context = {
         'featured_plans': featured_plans,
@@ -82,7 +82,7 @@ def homepage(request):
 
 def pricing(request):
     """Display all available membership plans"""
-    membership_plans = MembershipPlan.objects.filter(is_active=True).order_by('price')
+    membership_plans = active_plans()
     
     context = {
         'membership_plans': membership_plans,
@@ -296,39 +296,10 @@ def reset_password_view(request):
 @login_required
 def dashboard(request):
     """Dashboard accessible to all authenticated users"""
-    try:
-        # Get user profile and membership data
-        user_profile = UserProfile.objects.get(user=request.user)
-        user_membership = UserMembership.objects.select_related('plan').get(user=request.user)
-        payments = Payment.objects.filter(user=request.user).order_by('-created_at')[:5]
-        recent_activity = ActivityLog.objects.filter(user=request.user).order_by('-timestamp')[:10]
-        
-        # Get membership statistics
-        total_members = User.objects.filter(userprofile__user_type="member").count()
-        active_members = UserMembership.objects.filter(status='active').count()
-        
-        context = {
-            'user_profile': user_profile,
-            'user_membership': user_membership,
-            'payments': payments,
-            'recent_activity': recent_activity,
-            'total_members': total_members,
-            'active_members': active_members,
-        }
-        
-    except (UserProfile.DoesNotExist, UserMembership.DoesNotExist):
+    # Cached per user and invalidated by signals (see dashboard.py)
+    context = get_dashboard(request.user)
+    if context['user_membership'] is None:
         # User doesn't have profile or membership yet - still show dashboard
-        user_profile = None
-        user_membership = None
-        
-        context = {
-            'user_profile': user_profile,
-            'user_membership': user_membership,
-            'payments': [],
-            'recent_activity': [],
-            'total_members': User.objects.filter(userprofile__user_type='member').count(),
-            'active_members': UserMembership.objects.filter(status='active').count(),
-        }
         messages.info(request, 'Complete your profile and choose a membership plan!')
     
     return render(request, 'dashboard.html', context)
@@ -360,17 +331,13 @@ def profile(request):
 @login_required
 def membership_plans(request):
     """View all active membership plans"""
-    # Get all active plans
-    all_active_plans = MembershipPlan.objects.filter(is_active=True)
+    # Get all active plans (cached, see catalog.py)
+    all_active_plans = active_plans()
     
     # Get user's current plan tier if they have one
-    current_plan_tier = None
-    try:
-        user_membership = UserMembership.objects.get(user=request.user)
-        if user_membership.plan:
-            current_plan_tier = user_membership.plan.tier
-    except UserMembership.DoesNotExist:
-        pass
+    current_plan_tier = UserMembership.objects.filter(
+        user=request.user, plan__isnull=False
+    ).values_list('plan__tier', flat=True).first()
     
     context = {
         'current_plan': current_plan_tier,
@@ -382,17 +349,14 @@ def upgrade_membership(request, tier):
     """Handle membership upgrade requests"""
     try:
         # Get the membership plan (this validates the tier exists and is active)
-        membership_plan = MembershipPlan.objects.get(tier=tier, is_active=True)
+        membership_plan = get_plan(tier=tier)
+        if membership_plan is None:
+            raise MembershipPlan.DoesNotExist
         
         # Check if user already has this plan
-        try:
-            user_membership = UserMembership.objects.get(user=request.user)
-            if user_membership.plan and user_membership.plan.tier == tier:
-                messages.info(request, f'You already have the {tier} membership.')
-                return redirect('membership_plans')
-        except UserMembership.DoesNotExist:
-            # User doesn't have a membership yet - that's fine
-            pass
+        if UserMembership.objects.filter(user=request.user, plan_id=membership_plan.id).exists():
+            messages.info(request, f'You already have the {tier} membership.')
+            return redirect('membership_plans')
         
         # Redirect to currency selection
         return redirect('currency_selection', plan_id=membership_plan.id)
@@ -406,7 +370,9 @@ def upgrade_membership(request, tier):
 @login_required
 def currency_selection(request, plan_id):
     """Select currency for payment"""
-    membership_plan = get_object_or_404(MembershipPlan, id=plan_id, is_active=True)
+    membership_plan = get_plan(plan_id)
+    if membership_plan is None:
+        raise Http404('No active membership plan matches the given query.')
     
     if request.method == 'POST':
         currency = request.POST.get('currency')
@@ -423,70 +389,30 @@ def currency_selection(request, plan_id):
 @login_required
 def payment(request, plan_id, currency):
     """Process payment"""
-    membership_plan = get_object_or_404(MembershipPlan, id=plan_id, is_active=True)
+    membership_plan = get_plan(plan_id)
+    if membership_plan is None:
+        raise Http404('No active membership plan matches the given query.')
     
-    # Convert price based on currency
-    conversion_rates = {'USD': 1.0, 'EUR': 0.85, 'GBP': 0.75}
-    if currency not in conversion_rates:
+    # Prices are converted once when the catalog is built
+    if currency not in membership_plan.prices:
         messages.error(request, 'Invalid currency.')
         return redirect('currency_selection', plan_id=plan_id)
     
-    amount = float(membership_plan.price) * conversion_rates[currency]
-    amount_cents = int(amount * 100)
-    amount_display = Decimal(amount).quantize(Decimal('0.00'))
+    amount_display = membership_plan.prices[currency]
+    amount_cents = int(amount_display * 100)
     
     if request.method == 'POST':
         form = PaymentForm(request.POST)
         if form.is_valid():
-            try:
-                token = form.cleaned_data['stripe_token']
-                
-                charge = stripe.Charge.create(
-                    amount=amount_cents,
-                    currency=currency.lower(),
-                    description=f'{membership_plan.tier.title()} Membership - {membership_plan.name}',
-                    source=token,
-                )
-                
-                if charge.status == 'succeeded':
-                    # Update or create user membership
-                    user_membership, created = UserMembership.objects.get_or_create(
-                        user=request.user,
-                        defaults={'plan': membership_plan, 'status': 'active'}
-                    )
-                    
-                    if not created:
-                        user_membership.plan = membership_plan
-                        user_membership.status = 'active'
-                        user_membership.save()
-                    
-                    # Record payment
-                    Payment.objects.create(
-                        user=request.user,
-                        user_membership=user_membership,
-                        amount=amount_display,
-                        currency=currency,
-                        stripe_payment_intent_id=charge.id,
-                        status='succeeded',
-                        description=f'{membership_plan.tier.title()} Membership Payment'
-                    )
-                    
-                    # Log payment activity
-                    log_activity(
-                        request.user,
-                        'payment',
-                        f'Successfully upgraded to {membership_plan.tier} membership'
-                    )
-                    
-                    messages.success(request, f'Successfully upgraded to {membership_plan.tier} membership!')
-                    return redirect('payment_success')
-                else:
-                    messages.error(request, 'Payment failed. Please try again.')
-                    
-            except stripe.error.StripeError as e:
-                messages.error(request, f'Payment error: {str(e)}')
-            except Exception as e:
-                messages.error(request, 'An unexpected error occurred.')
+            # The charge itself runs in the job worker (`manage.py run_jobs`)
+            payment_record = start_charge(
+                request.user,
+                membership_plan,
+                amount_display,
+                currency,
+                form.cleaned_data['stripe_token'],
+            )
+            return redirect(f"{reverse('payment_success')}?payment={payment_record.pk}")
     else:
         form = PaymentForm()
     
@@ -504,10 +430,39 @@ def payment(request, plan_id, currency):
 
 @login_required
 def payment_success(request):
-    """Payment success page"""
-    return render(request, 'payment_success.html')
+    """Payment status page, polled until the background charge finishes"""
+    payment_record = None
+    try:
+        payment_record = Payment.objects.select_related('plan').filter(
+            pk=request.GET.get('payment'), user=request.user
+        ).first()
+    except (ValueError, ValidationError):
+        pass
+
+    if payment_record and payment_record.status == 'succeeded' and not request.htmx:
+        # The plan is SET_NULL if it was deleted since
+        if payment_record.plan:
+            messages.success(request, f'Successfully upgraded to {payment_record.plan.tier} membership!')
+        else:
+            messages.success(request, 'Your payment was successful!')
+
+    template = 'payment_status.html' if request.htmx else 'payment_success.html'
+    return render(request, template, {'payment': payment_record})
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """Stripe webhook: verify and store the event, applied later by `manage.py process_webhooks`"""
+    try:
+        webhooks.receive(request.body, request.META.get('HTTP_STRIPE_SIGNATURE'))
+    except webhooks.InvalidWebhook:
+        return HttpResponse(status=400)
+    except webhooks.WebhookNotConfigured:
+        return HttpResponse(status=503)
+    return HttpResponse(status=200)
 
 @login_required
+@replica_reads
 def payment_history(request):
     """View payment history"""
     payments = Payment.objects.filter(user=request.user).order_by('-created_at')
@@ -520,9 +475,17 @@ def cancel_membership(request):
         user_membership = UserMembership.objects.get(user=request.user)
         
         if request.method == 'POST':
-            user_membership.status = 'cancelled'
-            user_membership.cancel_at_period_end = True
-            user_membership.save()
+            period_end = user_membership.current_period_end
+            if period_end and period_end > timezone.now() and user_membership.status == 'active':
+                # Access runs to the end of the paid period; `manage.py sweep_memberships` ends it then
+                user_membership.cancel_at_period_end = True
+                user_membership.save(update_fields=['cancel_at_period_end', 'updated_at'])
+                message = f'Your membership will end on {timezone.localtime(period_end):%B %d, %Y}.'
+            else:
+                user_membership.status = 'cancelled'
+                user_membership.cancel_at_period_end = False
+                user_membership.save()
+                message = 'Your membership cancellation request has been processed.'
             
             log_activity(
                 request.user,
@@ -530,7 +493,7 @@ def cancel_membership(request):
                 'Membership cancellation requested'
             )
             
-            messages.success(request, 'Your membership cancellation request has been processed.')
+            messages.success(request, message)
             return redirect('dashboard')
         
         context = {
@@ -542,28 +505,69 @@ def cancel_membership(request):
         messages.error(request, 'No active membership found.')
         return redirect('dashboard')
 
+@login_required
+def notification_list(request):
+    """The user's notifications; POST marks them all read"""
+    if request.method == 'POST':
+        notifications.mark_read(request.user)
+        return redirect('notifications')
+    return render(request, 'notifications.html', {'notifications': notifications.recent(request.user)})
+
 # ========================================================
 # Admin Views
 # ========================================================
 
 @login_required
 @user_passes_test(lambda u: u.is_superuser or is_admin(u))
+@replica_reads
 def admin_dashboard(request):
     """Admin dashboard"""
-    total_members = User.objects.filter(userprofile__user_type='member').count()
-    active_members = UserMembership.objects.filter(status='active').count()
-    total_revenue = Payment.objects.filter(status='succeeded').aggregate(
-        total= sum('amount')
-    )['total'] or 0
+    counts = get_counts('total_members', 'active_members')
+    total_members = counts['total_members']
+    active_members = counts['active_members']
+    # Revenue comes from the daily rollup, not a scan of Payment
+    revenue = revenue_summary(days=30)
     
     context = {
         'total_members': total_members,
         'active_members': active_members,
-        'total_revenue': total_revenue,
+        'total_revenue': revenue['total_revenue'],
+        'revenue_by_currency': revenue['revenue_by_currency'],
+        'revenue_trend': revenue['revenue_trend'],
     }
     
     return render(request, 'admin_dashboard.html', context)
 
+@login_required
+@user_passes_test(lambda u: u.is_superuser or is_admin(u))
+def metrics(request):
+    """Rolling per-route request metrics in Prometheus text format (see metrics.py)"""
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@login_required
+@user_passes_test(lambda u: u.is_superuser or is_admin(u))
+def request_profiles(request):
+    """Browse saved request profiles and get a token to profile your own requests (see profiling.py)"""
+    context = {
+        'profiles': profiling.list_profiles(),
+        'enabled': settings.PROFILING_ENABLED,
+        'threshold': settings.PROFILE_SLOW_THRESHOLD,
+        'token': profiling.make_token(request.user),
+        'query_flag': profiling.QUERY_FLAG,
+    }
+    return render(request, 'profiling.html', context)
+
+@login_required
+@user_passes_test(lambda u: u.is_superuser or is_admin(u))
+def request_profile_download(request, name):
+    """A saved profile as a download, or as text with ?view=1"""
+    path = profiling.profile_path(name)
+    if path is None:
+        raise Http404('No such profile.')
+    if request.GET.get('view'):
+        return HttpResponse(profiling.summary(path), content_type='text/plain; charset=utf-8')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
 # ========================================================
 # Logout View
 # ========================================================
@@ -600,34 +604,39 @@ def handler400(request, exception):
 
 # views.py - Add these new views
 @login_required
+@replica_reads
 def member_directory(request):
-    """Searchable member directory"""
+    """Searchable member directory, one page at a time"""
     search_query = request.GET.get('q', '')
     industry_filter = request.GET.get('industry', '')
+    skill_filter = request.GET.get('skill', '')
     
-    members = MemberDirectory.objects.filter(
-        is_public=True, 
-        verification_status='verified'
-    ).select_related('user')
-    
-    if search_query:
-        members = members.filter(
-            Q(user__first_name__icontains=search_query) |
-            Q(user__last_name__icontains=search_query) |
-            Q(job_title__icontains=search_query) |
-            Q(company__icontains=search_query) |
-            Q(expertise__icontains=search_query)
-        )
-    
-    if industry_filter:
-        members = members.filter(association__industry=industry_filter)
+    # Keyset-paginated cards, ranked by the full-text index when searching (see search.py)
+    try:
+        after = int(request.GET['after'])
+    except (KeyError, ValueError):
+        after = None
+    members, next_cursor = search.directory_page(search_query, industry_filter, after=after, skill=skill_filter)
     
-    return render(request, 'member_directory.html', {
+    context = {
         'members': members,
-        'search_query': search_query
-    })
+        'search_query': search_query,
+        'industry_filter': industry_filter,
+        'skill_filter': skill_filter,
+        'next_cursor': next_cursor,
+    }
+    # Infinite scroll requests only need the next page of cards
+    template = 'member_directory_page.html' if request.htmx else 'member_directory.html'
+    return render(request, template, context)
+
+@login_required
+@replica_reads
+def skill_facets(request):
+    """Per-skill member counts for the directory filter (denormalized, see skills.py)"""
+    return JsonResponse({'skills': skills.facets()})
 
 @login_required
+@replica_reads
 def industry_events(request):
     """Upcoming industry events"""
     events = IndustryEvent.objects.filter(
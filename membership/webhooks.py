@@ -0,0 +1,288 @@
+"""
+Stripe webhooks: stored on receipt, applied later by `manage.py process_webhooks`.
+
+The view only verifies the signature and inserts the raw event into the
+WebhookEvent inbox (a redelivered event id is a no-op), so Stripe gets its
+2xx within a single INSERT even during a burst of renewals. Workers claim
+whole customers at a time and apply each customer's events oldest first,
+so a subscription update never overtakes the event that created it.
+"""
+import json
+import logging
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import stripe
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import MembershipPlan, Payment, UserMembership, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Stripe subscription status -> UserMembership.status
+SUBSCRIPTION_STATUSES = {
+    'active': 'active',
+    'trialing': 'active',
+    'past_due': 'pending',
+    'unpaid': 'pending',
+    'incomplete': 'pending',
+    'canceled': 'cancelled',
+    'incomplete_expired': 'inactive',
+    'paused': 'inactive',
+}
+
+
+# Unset, or left at the value the settings file used to ship with
+UNCONFIGURED_SECRETS = ('', 'your-stripe-webhook-secret')
+
+
+class InvalidWebhook(Exception):
+    """The request is not a correctly signed Stripe event"""
+
+
+class WebhookNotConfigured(Exception):
+    """No real STRIPE_WEBHOOK_SECRET is set, so no event can be verified"""
+
+
+def receive(body, signature):
+    """Verify and store one webhook delivery. Returns the event id."""
+    secret = settings.STRIPE_WEBHOOK_SECRET
+    if secret in UNCONFIGURED_SECRETS:
+        # Anyone could sign with a known or empty secret
+        logger.error('STRIPE_WEBHOOK_SECRET is not set; refusing webhook')
+        raise WebhookNotConfigured
+    try:
+        payload = body.decode('utf-8')
+        stripe.WebhookSignature.verify_header(
+            payload, signature, secret,
+            tolerance=getattr(settings, 'STRIPE_WEBHOOK_TOLERANCE', 300),
+        )
+        event = json.loads(payload)
+        event_id, event_type, created = event['id'], event['type'], event['created']
+        data = event['data']['object']
+    except (UnicodeDecodeError, ValueError, KeyError, TypeError, stripe.error.SignatureVerificationError) as e:
+        raise InvalidWebhook(str(e)) from e
+
+    customer = data.get('customer') if isinstance(data, dict) else None
+    # One INSERT; Stripe retries the same event id until it sees a 2xx
+    WebhookEvent.objects.bulk_create(
+        [
+            WebhookEvent(
+                event_id=event_id,
+                type=event_type,
+                customer=customer if isinstance(customer, str) else '',
+                created=_timestamp(created),
+                payload=event,
+            )
+        ],
+        ignore_conflicts=True,
+    )
+    return event_id
+
+
+def claim(worker, limit=10):
+    """Lock the pending events of up to `limit` customers for this worker.
+
+    Returns {customer: [events, oldest first]}. A customer with events
+    already locked by another worker is skipped so its order is kept, and
+    so is one waiting on a retry, which would only be claimed to be let go.
+    """
+    now = timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'
+    with transaction.atomic():
+        busy = WebhookEvent.objects.filter(status='pending').exclude(locked_by='').values('customer')
+        waiting = WebhookEvent.objects.filter(status='pending', run_after__gt=now).values('customer')
+        due = (
+            WebhookEvent.objects.filter(status='pending', locked_by='', run_after__lte=now)
+            .exclude(customer__in=busy)
+            .exclude(customer__in=waiting)
+            .order_by('created', 'id')
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            # Rows another worker is claiming right now are passed over instead of claimed twice
+            due = due.select_for_update(skip_locked=True)
+        due = due.values_list('customer', flat=True)
+        customers = []
+        for customer in due[:limit * 20]:
+            if customer not in customers:
+                customers.append(customer)
+                if len(customers) == limit:
+                    break
+        if not customers:
+            return {}
+        # The locked_by guard makes the claim safe on backends without row locks (SQLite)
+        WebhookEvent.objects.filter(status='pending', locked_by='', customer__in=customers).update(
+            locked_by=token, locked_at=now,
+        )
+    claimed = {}
+    for event in WebhookEvent.objects.filter(locked_by=token, status='pending').order_by('created', 'id'):
+        claimed.setdefault(event.customer, []).append(event)
+    return claimed
+
+
+def requeue_stale(stale_after=None):
+    """Unlock events whose worker died mid-run"""
+    stale_after = stale_after or getattr(settings, 'JOB_STALE_AFTER', 600)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return WebhookEvent.objects.filter(status='pending', locked_at__lt=cutoff).update(locked_by='', locked_at=None)
+
+
+def process(events):
+    """Apply one customer's claimed events in order.
+
+    Stops at the first event that fails or is not yet due, leaving it and
+    everything after it for a later run; an event that keeps failing is
+    marked failed after WEBHOOK_MAX_ATTEMPTS so it stops blocking the rest.
+    Returns the events that were finished.
+    """
+    done = []
+    for index, event in enumerate(events):
+        if event.run_after > timezone.now():
+            _unlock(events[index:])
+            break
+        event.attempts += 1
+        try:
+            with transaction.atomic():
+                handler = HANDLERS.get(event.type)
+                applied = handler(event, event.payload['data']['object']) if handler else False
+        except Exception:
+            logger.exception('Webhook %s (%s) failed on attempt %s', event.event_id, event.type, event.attempts)
+            event.last_error = traceback.format_exc()
+            if event.attempts < getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 5):
+                delay = getattr(settings, 'JOB_RETRY_DELAY', 10) * (2 ** (event.attempts - 1))
+                event.run_after = timezone.now() + timedelta(seconds=delay)
+                _finish(event)
+                _unlock(events[index + 1:])
+                break
+            event.status = 'failed'
+        else:
+            event.status = 'processed' if applied else 'ignored'
+            event.last_error = ''
+        event.processed_at = timezone.now()
+        _finish(event)
+        done.append(event)
+    return done
+
+
+def _finish(event):
+    event.locked_by = ''
+    event.locked_at = None
+    event.save(update_fields=[
+        'status', 'attempts', 'run_after', 'locked_by', 'locked_at', 'last_error', 'processed_at',
+    ])
+
+
+def _unlock(events):
+    if events:
+        WebhookEvent.objects.filter(pk__in=[event.pk for event in events]).update(locked_by='', locked_at=None)
+
+
+# ---------------------------------------------------------------------------
+# Handlers: (event, event.data.object) -> True if applied, False if ignored
+# ---------------------------------------------------------------------------
+
+def _subscription(event, data):
+    membership = _membership(data.get('id'), data.get('customer'), data.get('metadata'))
+    if membership is None:
+        return False
+    # Stripe does not deliver in order; never let an older snapshot overwrite a newer one
+    if membership.stripe_synced_at and event.created < membership.stripe_synced_at:
+        return False
+
+    membership.stripe_subscription_id = data['id']
+    membership.stripe_customer_id = data.get('customer') or membership.stripe_customer_id
+    if event.type == 'customer.subscription.deleted':
+        membership.status = 'cancelled'
+    else:
+        membership.status = SUBSCRIPTION_STATUSES.get(data.get('status'), membership.status)
+    membership.cancel_at_period_end = bool(data.get('cancel_at_period_end'))
+
+    items = (data.get('items') or {}).get('data') or [{}]
+    # Newer API versions report the period per subscription item
+    start = data.get('current_period_start') or items[0].get('current_period_start')
+    end = data.get('current_period_end') or items[0].get('current_period_end')
+    if start:
+        membership.current_period_start = _timestamp(start)
+    if end:
+        membership.current_period_end = _timestamp(end)
+    price = (items[0].get('price') or {}).get('id')
+    if price:
+        membership.plan = MembershipPlan.objects.filter(stripe_price_id=price).first() or membership.plan
+
+    membership.stripe_synced_at = event.created
+    membership.save()
+    return True
+
+
+def _invoice(event, data):
+    membership = _membership(data.get('subscription'), data.get('customer'), data.get('metadata'))
+    if membership is None:
+        return False
+    paid = event.type in ('invoice.paid', 'invoice.payment_succeeded')
+    status = 'succeeded' if paid else 'failed'
+    payment, created = Payment.objects.get_or_create(
+        stripe_payment_intent_id=data.get('payment_intent') or data['id'],
+        defaults={
+            'user': membership.user,
+            'user_membership': membership,
+            'plan': membership.plan,
+            'amount': Decimal(data.get('amount_paid' if paid else 'amount_due') or 0) / 100,
+            'currency': (data.get('currency') or 'usd').upper(),
+            'status': status,
+            'description': f'Membership renewal ({data["id"]})'[:200],
+        },
+    )
+    # A late failure notice must not undo a payment that went through
+    if not created and payment.status != status and payment.status != 'succeeded':
+        payment.status = status
+        payment.save()
+    return True
+
+
+def _charge_refunded(event, data):
+    ids = [value for value in (data.get('id'), data.get('payment_intent')) if value]
+    payment = Payment.objects.filter(stripe_payment_intent_id__in=ids).first()
+    if payment is None or not data.get('refunded'):
+        return False
+    if payment.status != 'refunded':
+        payment.status = 'refunded'
+        payment.save()
+    return True
+
+
+HANDLERS = {
+    'customer.subscription.created': _subscription,
+    'customer.subscription.updated': _subscription,
+    'customer.subscription.deleted': _subscription,
+    'invoice.paid': _invoice,
+    'invoice.payment_succeeded': _invoice,
+    'invoice.payment_failed': _invoice,
+    'charge.refunded': _charge_refunded,
+}
+
+
+def _membership(subscription_id, customer_id, metadata=None):
+    """The UserMembership an event is about: by subscription, then customer, then metadata.user_id"""
+    if subscription_id:
+        membership = UserMembership.objects.filter(stripe_subscription_id=subscription_id).first()
+        if membership:
+            return membership
+    if customer_id:
+        membership = UserMembership.objects.filter(stripe_customer_id=customer_id).first()
+        if membership:
+            return membership
+    user_id = (metadata or {}).get('user_id')
+    if user_id and str(user_id).isdigit():
+        membership = UserMembership.objects.filter(user_id=int(user_id)).first()
+        if membership:
+            membership.stripe_customer_id = customer_id or membership.stripe_customer_id
+            return membership
+    return None
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(int(value), tz=dt_timezone.utc)